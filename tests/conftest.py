@@ -0,0 +1,50 @@
+import os
+import sys
+import threading
+
+import pytest
+import serial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules import their siblings directly, like when run from their folder
+sys.path.insert(0, os.path.join(ROOT, "wheel_hid"))
+sys.path.insert(0, os.path.join(ROOT, "wheel_hid", "depreaceated"))
+
+from wheellink import DEFAULT_BAUD, waitForLine, sendCommand
+
+
+@pytest.fixture
+def runSim():
+    # Starts a FirmwareSim (or subclass) on a pty in a thread; stopped after the test
+    started = []
+
+    def start(sim):
+        stop = threading.Event()
+        thread = threading.Thread(target=sim.run, kwargs={"stop": stop}, daemon=True)
+        thread.start()
+        started.append((sim, stop, thread))
+        return sim
+
+    yield start
+    for sim, stop, thread in started:
+        stop.set()
+        thread.join(timeout=2.0)
+        sim.close()
+
+
+@pytest.fixture
+def pair():
+    # Opens a running sim's pty and answers its pairing request like the driver
+    opened = []
+
+    def connect(sim):
+        ser = serial.Serial(sim.path, DEFAULT_BAUD, timeout=0.1)
+        opened.append(ser)
+        assert waitForLine(ser, "PAIRING_REQUEST:", 2.0)
+        sendCommand(ser, "PAIRING_OK")
+        assert waitForLine(ser, "PAIRING_CONFIRMED", 1.0)
+        return ser
+
+    yield connect
+    for ser in opened:
+        ser.close()
@@ -0,0 +1,81 @@
+import os
+import errno
+
+import pytest
+
+import hid_gadget
+from hid_gadget import ATTRIBUTES, CONFIG, FUNCTION, REPORT_DESC, setup_gadget, remove_gadget, pending_changes
+
+UDC = "fe800000.usb"
+LINK = os.path.join(CONFIG, os.path.basename(FUNCTION))
+
+
+@pytest.fixture
+def configfs(tmp_path, monkeypatch):
+    # A plain directory laid out like configfs, with f_hid's EBUSY rule
+    root = tmp_path / "usb_gadget"
+    udc_dir = tmp_path / "udc"
+    root.mkdir()
+    (udc_dir / UDC).mkdir(parents=True)
+    write_attr = hid_gadget.write_attr
+
+    def busy_when_linked(path, value):
+        gadget = os.path.join(str(root), "wheel")
+        if path.startswith(os.path.join(gadget, FUNCTION) + os.sep) \
+                and os.path.islink(os.path.join(gadget, LINK)):
+            raise OSError(errno.EBUSY, "Device or resource busy", path)
+        write_attr(path, value)
+
+    monkeypatch.setattr(hid_gadget, "write_attr", busy_when_linked)
+    return str(root), str(udc_dir)
+
+def gadget_state(path):
+    values = {rel: hid_gadget.read_attr(os.path.join(path, rel)) for rel, _ in ATTRIBUTES}
+    return values, os.path.islink(os.path.join(path, LINK)), hid_gadget.bound_udc(path)
+
+
+def test_create(configfs):
+    root, udc_dir = configfs
+    changes = setup_gadget(root, udc_dir=udc_dir, log=lambda line: None)
+    path = os.path.join(root, "wheel")
+    values, linked, udc = gadget_state(path)
+    assert values["idVendor"] == b"0x1d6b\n"
+    assert values[FUNCTION + "/report_desc"] == REPORT_DESC
+    assert linked and udc == UDC
+    assert ("udc", UDC) in changes
+
+def test_rerun_changes_nothing(configfs):
+    root, udc_dir = configfs
+    setup_gadget(root, udc_dir=udc_dir, log=lambda line: None)
+    path = os.path.join(root, "wheel")
+    before = os.stat(os.path.join(path, "UDC")).st_mtime_ns
+    assert setup_gadget(root, udc_dir=udc_dir, log=lambda line: None) == []
+    assert pending_changes(path) == []
+    assert os.stat(os.path.join(path, "UDC")).st_mtime_ns == before
+
+def test_repair_function_attribute(configfs):
+    root, udc_dir = configfs
+    setup_gadget(root, udc_dir=udc_dir, log=lambda line: None)
+    path = os.path.join(root, "wheel")
+    with open(os.path.join(path, FUNCTION, "report_length"), "w") as f:
+        f.write("8\n")
+    with open(os.path.join(path, "strings/0x409/product"), "w") as f:
+        f.write("Other\n")
+
+    changes = setup_gadget(root, udc_dir=udc_dir, log=lambda line: None)
+    assert ("attr", FUNCTION + "/report_length") in changes
+    assert ("attr", "strings/0x409/product") in changes
+    assert ("link", LINK) in changes
+    # Only what differed was written
+    assert len([kind for kind, _ in changes if kind == "attr"]) == 2
+    values, linked, udc = gadget_state(path)
+    assert values[FUNCTION + "/report_length"] == b"2\n"
+    assert linked and udc == UDC
+    assert pending_changes(path) == []
+
+def test_teardown(configfs):
+    root, udc_dir = configfs
+    setup_gadget(root, udc_dir=udc_dir, log=lambda line: None)
+    assert remove_gadget(root)
+    assert not os.path.exists(os.path.join(root, "wheel"))
+    assert not remove_gadget(root)
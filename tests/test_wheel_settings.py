@@ -0,0 +1,22 @@
+import pytest
+
+from wheel_settings import SettingsError, parse_value, validate, from_config, to_config, defaults
+
+
+def test_address_is_always_hex():
+    assert parse_value("address", "48") == 0x48
+    assert parse_value("address", "0x48") == 0x48
+    assert parse_value("address", 0x48) == 0x48
+
+def test_config_round_trip():
+    settings = validate(dict(defaults(), address="0x49", min=100, center=16000, max=32000))
+    cfg = to_config(settings, {"other": {"kept": True}})
+    assert cfg["address"] == "0x49"
+    assert cfg["calibration"] == {"min": 100, "center": 16000, "max": 32000}
+    assert cfg["other"] == {"kept": True}
+    assert validate(from_config(cfg)) == settings
+
+def test_validate_reports_every_error():
+    with pytest.raises(SettingsError) as e:
+        validate({"address": "zz", "smoothing": 2.0, "bogus": 1})
+    assert len(e.value.errors) == 3
@@ -0,0 +1,65 @@
+import time
+import threading
+
+import pytest
+
+from wheelsim import FirmwareSim
+from wheeldiscovery import Wheel
+from wheeldaemon import WheelDaemon, NullOutput
+from wheelshm import StateReader, devicePath
+
+
+@pytest.fixture
+def pairedWheel(runSim, pair):
+    # A running sim, already paired, as discovery would hand it to the daemon
+    def start(code, **kwargs):
+        sim = runSim(FirmwareSim(**kwargs))
+        return Wheel(sim.path, code, pair(sim))
+    return start
+
+
+def test_fallback_does_not_stall_other_wheels(pairedWheel):
+    daemon = WheelDaemon(outputFactory=NullOutput, controlPath=None, baud="off")
+    slow = daemon.addWheel(pairedWheel("SLOW", rate=500, seed=1), paired=True)
+    other = daemon.addWheel(pairedWheel("OTHER", rate=500, seed=2), paired=True)
+
+    # A fallback that takes a while, like one stepping through several rates
+    fallbackDone = threading.Event()
+    def fallback():
+        time.sleep(1.0)
+        fallbackDone.set()
+        return slow.ser.baudrate
+    slow.fallback = fallback
+
+    thread = threading.Thread(target=daemon.run, args=(3.0,), daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    slow.needsFallback = True      # Picked up after its next read
+    time.sleep(0.3)
+    assert slow.recovering
+    before = other.samples
+    assert fallbackDone.wait(2.0)
+    # The other wheel kept streaming while the fallback ran
+    assert other.samples - before > 200
+    time.sleep(0.8)
+    assert not slow.recovering
+    slowBefore = slow.samples
+    time.sleep(0.3)
+    assert slow.samples > slowBefore
+    thread.join(timeout=3.0)
+
+
+def test_state_file_per_wheel(pairedWheel, tmp_path):
+    base = str(tmp_path / "wheeldriver.state")
+    daemon = WheelDaemon(outputFactory=NullOutput, controlPath=None, baud="off", statePath=base)
+    for code in ("WHEEL", "PEDALS"):
+        daemon.addWheel(pairedWheel(code, rate=200, seed=1), paired=True)
+    thread = threading.Thread(target=daemon.run, args=(1.0,), daemon=True)
+    thread.start()
+    time.sleep(0.6)
+    for code in ("WHEEL", "PEDALS"):
+        reader = StateReader(devicePath(base, code))
+        state = reader.read()
+        reader.close()
+        assert state is not None and state.seq > 10
+    thread.join(timeout=3.0)
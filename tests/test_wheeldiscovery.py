@@ -0,0 +1,73 @@
+import time
+
+import wheeldiscovery
+from wheeldiscovery import Wheel, Rescanner, waitForPairing
+
+
+class ScriptedPort:
+    # Sends each (seconds, line) once it is due; remembers DTR pulses
+
+    def __init__(self, script):
+        self.started = time.monotonic()
+        self.script = list(script)
+        self.timeout = 0.05
+        self.pulses = 0
+        self.written = b""
+
+    @property
+    def dtr(self):
+        return False
+
+    @dtr.setter
+    def dtr(self, value):
+        if value:
+            self.pulses += 1
+
+    def write(self, data):
+        self.written += data
+
+    def readline(self):
+        elapsed = time.monotonic() - self.started
+        if self.script and self.script[0][0] <= elapsed:
+            return self.script.pop(0)[1] + b"\r\n"
+        time.sleep(self.timeout)
+        return b""
+
+
+def test_no_pulse_while_booting(monkeypatch):
+    monkeypatch.setattr(wheeldiscovery, "RESET_AFTER", 0.3)
+    # The open reset the board: BOOT_OK early, the first request after the limit
+    port = ScriptedPort([(0.1, b"BOOT_OK"), (0.6, b"PAIRING_REQUEST:WHEEL1")])
+    assert waitForPairing(port, timeout=2.0) == "WHEEL1"
+    assert port.pulses == 0
+
+def test_pulse_when_silent(monkeypatch):
+    monkeypatch.setattr(wheeldiscovery, "RESET_AFTER", 0.3)
+    # Paired and not streaming, or hung: only a reset brings the request
+    port = ScriptedPort([(0.6, b"BOOT_OK"), (0.8, b"PAIRING_REQUEST:WHEEL1")])
+    assert waitForPairing(port, timeout=2.0) == "WHEEL1"
+    assert port.pulses == 1
+    assert port.written.startswith(b"RESET_PAIRING")
+
+def test_rescan_skips_failed_ports():
+    present = ["/dev/ttyUSB0", "/dev/ttyACM0"]
+    probed = []
+
+    def probe(ports):
+        probed.append(list(ports))
+        return [Wheel(p, "WHEEL1", None) for p in ports if p == "/dev/ttyACM0"]
+
+    rescan = Rescanner(lambda: list(present), probe)
+    assert [w.port for w in rescan()] == ["/dev/ttyACM0"]
+    # The wheel is served now, the other port did not answer: nothing to probe
+    assert rescan({"/dev/ttyACM0"}) == []
+    assert probed == [["/dev/ttyUSB0", "/dev/ttyACM0"]]
+    # Unplugged and plugged back in: probed once more
+    present.remove("/dev/ttyUSB0")
+    rescan({"/dev/ttyACM0"})
+    present.append("/dev/ttyUSB0")
+    rescan({"/dev/ttyACM0"})
+    assert probed[-1] == ["/dev/ttyUSB0"]
+    # A served wheel that was dropped (e.g. reset) is probed again
+    rescan()
+    assert probed[-1] == ["/dev/ttyACM0"]
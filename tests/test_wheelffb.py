@@ -0,0 +1,134 @@
+import os
+import time
+import struct
+from collections import deque
+
+import pytest
+
+from wheelsim import FirmwareSim
+from wheelffb import (FFBridge, FF_CONSTANT, FF_RUMBLE, FF_EFFECT_SIZE, FF_EFFECT_HEADER,
+                      FF_DURATION_MAX, FF_RESEND_EARLY, FF_PLAY, parseEffect)
+
+
+class FakeFFSource:
+    # Stands in for FFDevice: events queued by the test, a pipe to wake select()
+
+    def __init__(self):
+        self.rfd, self.wfd = os.pipe()
+        self.events = deque()
+
+    def fileno(self):
+        return self.rfd
+
+    def push(self, *events):
+        self.events.extend(events)
+        os.write(self.wfd, b"\0")
+
+    def readFFEvents(self):
+        os.read(self.rfd, 4096)
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def close(self):
+        os.close(self.rfd)
+        os.close(self.wfd)
+
+
+class WriteLog:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+def effect(kind, effectId, level, length=0, delay=0):
+    # struct ff_effect as the kernel hands it to UI_BEGIN_FF_UPLOAD
+    data = bytearray(FF_EFFECT_SIZE)
+    FF_EFFECT_HEADER.pack_into(data, 0, kind, effectId, 0, 0, 0, length, delay)
+    if kind == FF_RUMBLE:
+        struct.pack_into("HH", data, 16, level, 0)
+    else:
+        struct.pack_into("h", data, 16, level)
+    return parseEffect(bytes(data))
+
+def waitFor(check, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.01)
+    return check()
+
+
+@pytest.fixture
+def bridge(runSim, pair):
+    # FFBridge with a fake event source, writing to a paired sim
+    source = FakeFFSource()
+    sim = runSim(FirmwareSim(rate=200, seed=1))
+    bridge = FFBridge(source, pair(sim))
+    bridge.start()
+    yield source, sim, bridge
+    bridge.stop()
+    source.push()
+    bridge.join(timeout=2.0)
+    source.close()
+
+
+def test_parse_effect():
+    assert effect(FF_CONSTANT, 3, -32767, length=250)["strength"] == 1.0
+    rumble = effect(FF_RUMBLE, 1, 0x8000)
+    assert rumble["id"] == 1 and rumble["length"] == 0
+    assert rumble["strength"] == pytest.approx(0.5, abs=1e-4)
+
+def test_play_stop_erase(bridge):
+    source, sim, ffb = bridge
+    source.push(("upload", effect(FF_CONSTANT, 0, 32767)), ("play", 0, 1))
+    assert waitFor(lambda: sim.ffLevel == 255)
+    source.push(("play", 0, 0))
+    assert waitFor(lambda: sim.ffLevel == 0)
+
+    source.push(("play", 0, 1))
+    assert waitFor(lambda: sim.ffLevel == 255)
+    source.push(("erase", 0))
+    assert waitFor(lambda: sim.ffLevel == 0)
+    # Erased effects can't be started again
+    source.push(("play", 0, 1))
+    time.sleep(0.1)
+    assert sim.ffLevel == 0
+
+def test_gain_and_strongest_effect(bridge):
+    source, sim, ffb = bridge
+    source.push(("upload", effect(FF_RUMBLE, 0, 0x4000)), ("upload", effect(FF_CONSTANT, 1, 32767)),
+                ("play", 0, 1))
+    assert waitFor(lambda: sim.ffLevel == round(0x4000 / 65535 * 255))
+    source.push(("play", 1, 1))
+    assert waitFor(lambda: sim.ffLevel == 255)
+    source.push(("gain", 0x8000))
+    assert waitFor(lambda: sim.ffLevel == round(0x8000 / 65535 * 255))
+
+def test_timed_effect_stops(bridge):
+    source, sim, ffb = bridge
+    source.push(("upload", effect(FF_CONSTANT, 0, 32767, length=200)), ("play", 0, 1))
+    assert waitFor(lambda: sim.ffLevel == 255)
+    assert waitFor(lambda: sim.ffLevel == 0 and ffb.level == 0, 1.0)
+    assert not ffb.mixer.playing
+
+def test_long_effect_is_resent():
+    # Two repeats of the longest replay length: more than one command can cover
+    source = FakeFFSource()
+    log = WriteLog()
+    ffb = FFBridge(source, log)
+    try:
+        source.push(("upload", effect(FF_CONSTANT, 0, 32767, length=0xFFFF)), ("play", 0, 2))
+        timeout = ffb.step(0.1)
+        packet = log.writes[-1]
+        assert packet[1] == FF_PLAY
+        assert (packet[3] << 8) | packet[4] == FF_DURATION_MAX
+        assert timeout == (FF_DURATION_MAX - FF_RESEND_EARLY) / 1000.0
+        # Waking up with nothing new still sends the next stretch
+        ffb.step(0)
+        assert len(log.writes) == 2
+    finally:
+        source.close()
@@ -0,0 +1,67 @@
+import os
+import math
+
+import pytest
+
+from conftest import ROOT
+from wheelfilter import NoiseFilter, DEADZONE_SIGMAS, HYSTERESIS_SIGMAS
+from wheelbench import loadCapture, referenceSignal, filterMetrics
+
+# Recorded from wheelsim.py with `wheelbench.py capture` (noise sigma 20, seed 7)
+CAPTURES = os.path.join(ROOT, "wheel_hid", "captures")
+
+
+def capture(name):
+    times, values = loadCapture(os.path.join(CAPTURES, name))
+    return values
+
+def restMetrics(values, outputs, rate=1000.0):
+    # Same measure as `wheelbench.py filter`: against a zero-lag centered average
+    half = int(rate * 0.005)
+    ref = referenceSignal(values, half)
+    still = [abs(ref[min(i + half, len(ref) - 1)] - ref[max(i - half, 0)]) < 20    # one sigma
+             for i in range(len(ref))]
+    return filterMetrics(outputs, ref, still, rate)
+
+
+@pytest.fixture(scope="module")
+def square():
+    return capture("sim_square_noise20.txt")
+
+
+def test_learns_noise_at_rest(square):
+    f = NoiseFilter()
+    for v in square:
+        f.update(v)
+    assert f.learned > len(square) // 2
+    assert f.sigma == pytest.approx(20.0, rel=0.15)
+    # Deadzone and hysteresis follow the learned noise
+    assert f.deadzone == pytest.approx(DEADZONE_SIGMAS * f.sigma)
+    assert f.hysteresis == pytest.approx(HYSTERESIS_SIGMAS * f.sigma * f.restGain)
+
+def test_cuts_rest_jitter(square):
+    f = NoiseFilter(deadzone=0)
+    outputs = [f.update(v) for v in square]
+    filtered = restMetrics(square, outputs)
+    raw = restMetrics(square, square)
+    assert filtered["restRms"] < 0.5 * raw["restRms"]
+    assert filtered["restChanges"] < 0.1 * raw["restChanges"]
+
+def test_fast_motion_is_not_smoothed():
+    f = NoiseFilter(noise=20.0, deadzone=0)
+    for i in range(500):
+        f.update(20 if i & 1 else -20)
+    # A fast turn: the output follows the input within a few samples
+    for i in range(1, 41):
+        out = f.update(i * 500)
+    assert f.alpha == 1.0
+    assert abs(out - 40 * 500) < 500
+
+def test_nothing_learned_in_constant_motion():
+    values = capture("sim_sine_noise20.txt")
+    f = NoiseFilter(deadzone=0)
+    outputs = [f.update(v) for v in values]
+    assert f.learned < len(values) // 100
+    # Close to passthrough: no lag added while the wheel keeps moving
+    err = math.sqrt(sum((o - v) ** 2 for o, v in zip(outputs, values)) / len(values))
+    assert err < 3 * 20.0
@@ -0,0 +1,45 @@
+from wheelsim import FirmwareSim
+from wheellink import DEFAULT_BAUD, switchBaud, negotiateBaud, fallbackBaud, waitForLine, sendCommand
+
+
+class LostBaudReply(FirmwareSim):
+    # Switches like the firmware, but while `lossy` the BAUD_OK reply arrives garbled
+    lossy = True
+
+    def write(self, line):
+        if self.lossy and line.startswith(b"BAUD_OK:"):
+            line = b"BA#D_OK:" + line[8:]
+        super().write(line)
+
+
+def linkWorks(ser):
+    sendCommand(ser, "BAUD_CHECK")
+    return waitForLine(ser, "BAUD_CONFIRMED", 0.5) is not None
+
+
+def test_switch_and_fallback(runSim, pair):
+    sim = runSim(FirmwareSim(seed=1))
+    with pair(sim) as ser:
+        assert negotiateBaud(ser) == 2000000
+        assert sim.baud == 2000000
+        assert fallbackBaud(ser) == 1000000
+        assert sim.baud == ser.baudrate == 1000000
+        assert linkWorks(ser)
+
+def test_lost_baud_ok_resyncs(runSim, pair):
+    sim = runSim(LostBaudReply(seed=1))
+    with pair(sim) as ser:
+        assert not switchBaud(ser, 2000000)
+        # The firmware switched anyway and reverted; the host has to follow
+        assert sim.baud == ser.baudrate == DEFAULT_BAUD
+        assert linkWorks(ser)
+
+def test_lost_baud_ok_during_fallback(runSim, pair):
+    sim = runSim(LostBaudReply(seed=1))
+    with pair(sim) as ser:
+        sim.lossy = False
+        assert negotiateBaud(ser) == 2000000
+        sim.lossy = True
+        fallbackBaud(ser)
+        assert sim.baud == ser.baudrate
+        assert linkWorks(ser)
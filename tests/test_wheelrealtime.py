@@ -0,0 +1,34 @@
+import gc
+import weakref
+
+from wheelrealtime import HotLoopGC, parseCpuList
+
+
+class Node:
+    pass
+
+
+def test_parse_cpu_list():
+    assert parseCpuList("1,4-5") == {1, 4, 5}
+    assert parseCpuList("") == set()
+
+def test_promoted_cycles_are_collected():
+    hot = HotLoopGC(interval=1.0, middleEvery=3, fullEvery=6).start()
+    try:
+        # A cycle still referenced during the young collections gets promoted
+        node = Node()
+        node.self = node
+        alive = weakref.ref(node)
+        now = hot.nextCollect
+        for _ in range(2):
+            hot.tick(now)
+            now += 1.0
+        del node
+        for _ in range(4):
+            hot.tick(now)
+            now += 1.0
+        assert alive() is None
+        assert not gc.isenabled()
+    finally:
+        hot.stop()
+    assert gc.isenabled()
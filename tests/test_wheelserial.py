@@ -0,0 +1,65 @@
+from wheelserial import FrameReader
+
+
+class FakePort:
+    # Like pyserial on Windows: no fileno(), only in_waiting and readinto()
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def readinto(self, buf):
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        n = min(len(buf), len(chunk))
+        buf[:n] = chunk[:n]
+        if n < len(chunk):
+            self.chunks.insert(0, chunk[n:])
+        return n
+
+
+def samples(reader):
+    return list(reader.samples[:reader.count])
+
+
+def test_line_split_across_reads():
+    reader = FrameReader(FakePort(b"12\r\n-3", b"4\r\n"))
+    assert reader.fd is None
+    assert reader.poll(0) == 1 and samples(reader) == [12]
+    assert reader.poll(0) == 1 and samples(reader) == [-34]
+    assert reader.latest() == -34
+
+def test_cr_handling():
+    reader = FrameReader(FakePort(b"1\n2\r\n\r\n\n3\r\n"))
+    assert reader.poll(0) == 3
+    assert samples(reader) == [1, 2, 3]
+    assert reader.messages == []
+
+def test_messages():
+    reader = FrameReader(FakePort(b"PAIRING_CONFIRMED\r\n5\r\n1x2\r\n99999999999\r\n-\r\nERROR:ADC_READ_FAILED\r\n"))
+    assert reader.poll(0) == 1
+    assert samples(reader) == [5]
+    assert reader.messages == [b"PAIRING_CONFIRMED", b"1x2", b"99999999999", b"-", b"ERROR:ADC_READ_FAILED"]
+
+def test_more_than_max_samples():
+    port = FakePort(b"".join(b"%d\r\n" % i for i in range(10)))
+    reader = FrameReader(port, maxSamples=4)
+    assert reader.poll(0) == 4 and samples(reader) == [0, 1, 2, 3]
+    # The rest is still buffered and handed out without another read
+    reads = reader.reads
+    assert reader.poll(0) == 4 and samples(reader) == [4, 5, 6, 7]
+    assert reader.poll(0) == 2 and samples(reader) == [8, 9]
+    assert reader.reads == reads
+
+def test_full_buffer_without_line_end_is_dropped():
+    reader = FrameReader(FakePort(b"7" * 64, b"7" * 40, b"77\r\n8\r\n"), size=64)
+    assert reader.poll(0) == 0
+    assert reader.fill == 0
+    # The rest of the overlong line is skipped too, not parsed as a sample
+    assert reader.poll(0) == 0
+    assert reader.poll(0) == 1 and samples(reader) == [8]
+    assert reader.messages == []
@@ -0,0 +1,107 @@
+import re
+import time
+
+import serial
+
+from wheelsim import FirmwareSim, TX_BUFFER, STATS_LINE_MAX, ADC_ERROR_LINE
+from wheelffb import FF_PLAY, encodeCommand
+from wheelserial import FrameReader
+from wheellink import DEFAULT_BAUD, waitForLine, sendCommand, requestStats
+
+STATS_LINE = re.compile(rb"STATS:loops=\d+,maxLoopUs=\d+,avgLoopUs=\d+,sent=\d+,coalesced=\d+,adcErrors=\d+\r\n")
+
+
+class TxWatch(FirmwareSim):
+    # Remembers the fullest the TX buffer got from streaming output
+    # (replies use println and may wait for room, like on the board)
+
+    def __init__(self, **kwargs):
+        self.maxTx = 0
+        super().__init__(**kwargs)
+
+    def sendSample(self):
+        super().sendSample()
+        self.maxTx = max(self.maxTx, len(self.tx))
+
+    def sendStats(self):
+        super().sendStats()
+        self.maxTx = max(self.maxTx, len(self.tx))
+
+
+def stream(ser, seconds):
+    reader = FrameReader(ser)
+    samples = 0
+    messages = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        samples += reader.poll(0.05)
+        messages += reader.messages
+    return samples, messages
+
+
+def test_stats_line(runSim, pair):
+    sim = runSim(FirmwareSim(seed=1))
+    with pair(sim) as ser:
+        stream(ser, 0.5)
+        sendCommand(ser, "STATS")
+        deadline = time.monotonic() + 1.0
+        line = b""
+        while not line.startswith(b"STATS:") and time.monotonic() < deadline:
+            line = ser.readline()
+        assert STATS_LINE.fullmatch(line)
+
+        # Counters start over after each reply
+        stream(ser, 0.5)
+        first = requestStats(ser)
+        second = requestStats(ser)
+        assert first["loops"] > 0
+        assert first["sent"] >= 30
+        assert second["sent"] < first["sent"] / 2
+
+def test_longest_stats_line_fits():
+    sim = FirmwareSim()
+    try:
+        sim.statLoops = sim.statLoopMaxUs = sim.statSent = sim.statCoalesced = sim.statAdcErrors = 2 ** 32 - 1
+        sim.statLoopTotalUs = sim.statLoops
+        sim.queueStats()
+        assert STATS_LINE.fullmatch(bytes(sim.statsOut))
+        assert len(sim.statsOut) < STATS_LINE_MAX
+    finally:
+        sim.close()
+
+def test_bounded_tx_coalesces(runSim, pair):
+    # 5 kHz of samples don't fit through 115200 baud: the newest one wins
+    sim = runSim(TxWatch(rate=5000, waveform="ramp", seed=1))
+    with pair(sim) as ser:
+        started = time.monotonic()
+        samples, messages = stream(ser, 1.0)
+        elapsed = time.monotonic() - started
+        # A host that stops reading can't make the board buffer more
+        time.sleep(0.5)
+        stats = requestStats(ser)
+
+    assert sim.maxTx <= TX_BUFFER
+    assert stats["coalesced"] > 1000
+    # At most baud/10 bytes per second, at least 5 bytes per line
+    assert samples <= DEFAULT_BAUD / 10 / 5 * (elapsed + 0.1)
+    assert samples > 500
+
+def test_adc_errors(runSim, pair):
+    sim = runSim(FirmwareSim(adcErrorRate=1.0, seed=1))
+    with pair(sim) as ser:
+        samples, messages = stream(ser, 0.5)
+        stats = requestStats(ser)
+    assert samples == 0
+    assert ADC_ERROR_LINE in messages
+    assert stats["adcErrors"] > 0
+    assert stats["sent"] == 0
+
+def test_ff_packet_inside_a_line(runSim):
+    # Like handleSerial(): the packet is taken out, the line around it survives
+    sim = runSim(FirmwareSim(seed=1))
+    with serial.Serial(sim.path, DEFAULT_BAUD, timeout=0.1) as ser:
+        assert waitForLine(ser, "PAIRING_REQUEST:", 2.0)
+        ser.write(b"PAIRING" + encodeCommand(FF_PLAY, 200, 0) + b"_OK\r\n")
+        assert waitForLine(ser, "PAIRING_CONFIRMED", 1.0)
+    assert sim.paired
+    assert sim.ffLevel == 200
@@ -0,0 +1,110 @@
+import os
+import time
+from array import array
+
+import pytest
+import serial
+
+from wheelsim import openPty
+from wheelsplit import SampleRing, SplitReader
+
+
+@pytest.fixture
+def port():
+    master, slave, path = openPty()
+    ser = serial.Serial(path, 115200, timeout=0.1)
+    yield master, ser
+    ser.close()
+    os.close(slave)
+    os.close(master)
+
+@pytest.fixture
+def ring():
+    ring = SampleRing(capacity=8)
+    yield ring
+    ring.close()
+
+
+def pop(ring, maxCount=16):
+    raws = array("i", bytes(4 * maxCount))
+    stamps = array("Q", bytes(8 * maxCount))
+    seqs = array("Q", bytes(8 * maxCount))
+    n = ring.popInto(raws, stamps, seqs, maxCount)
+    return list(raws[:n]), list(stamps[:n]), list(seqs[:n])
+
+
+def test_capacity_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        SampleRing(capacity=6)
+
+def test_wraps_past_capacity(ring):
+    for batch in range(5):
+        values = [batch * 10 + i for i in range(5)]
+        assert ring.pushMany(values, 5, 1000 + batch) == 5
+        raws, stamps, seqs = pop(ring)
+        assert raws == values
+        assert stamps == [1000 + batch] * 5
+        assert seqs == list(range(batch * 5, batch * 5 + 5))
+    assert ring.head == ring.tail == 25
+    assert ring.dropped == 0
+
+def test_drops_oldest_when_consumer_falls_behind(ring):
+    assert ring.pushMany(list(range(6)), 6, 1) == 6
+    # Two free slots left: the three oldest of this batch are dropped and counted
+    assert ring.pushMany([10, 11, 12, 13, 14], 5, 2) == 2
+    assert ring.dropped == 3
+    raws, stamps, seqs = pop(ring)
+    assert raws == [0, 1, 2, 3, 4, 5, 13, 14]
+    # The gap in the sequence numbers shows where samples went missing
+    assert seqs == [0, 1, 2, 3, 4, 5, 9, 10]
+    assert pop(ring) == ([], [], [])
+
+def test_second_mapping_sees_the_same_ring(ring):
+    other = SampleRing(name=ring.name)
+    try:
+        ring.pushMany([7, 8], 2, 5)
+        assert other.capacity == 8
+        assert pop(other)[0] == [7, 8]
+        assert ring.tail == 2
+    finally:
+        other.close()
+
+def test_split_reader_stream_and_closed_port(port):
+    master, ser = port
+    reader = SplitReader(ser)
+    try:
+        before = time.monotonic_ns()
+        os.write(master, b"1\r\n2\r\n-3\r\n")
+        got = []
+        deadline = time.monotonic() + 2.0
+        while len(got) < 3 and time.monotonic() < deadline:
+            count = reader.poll(0.2)
+            got += list(reader.samples[:count])
+        assert got == [1, 2, -3]
+        assert reader.latest() == -3
+        assert reader.stamps[count - 1] >= before
+        assert reader.dropped == 0
+
+        # The child going away closes the wake pipe, and poll() says so. (Closing
+        # the pty master would not do: the forked child holds a copy of it.)
+        reader.process.terminate()
+        reader.process.join()
+        with pytest.raises(OSError):
+            reader.poll(1.0)
+    finally:
+        reader.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="needs sched_setaffinity")
+def test_acquisition_pins_to_its_own_cpus(port):
+    master, ser = port
+    cpu = min(os.sched_getaffinity(0))
+    before = os.sched_getaffinity(0)
+    reader = SplitReader(ser, cpus={cpu})
+    try:
+        reader.poll(0.3)
+        assert os.sched_getaffinity(reader.process.pid) == {cpu}
+        # The driver process keeps its own set
+        assert os.sched_getaffinity(0) == before
+    finally:
+        reader.close()
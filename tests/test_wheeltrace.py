@@ -0,0 +1,48 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from wheelaxis import valueToPercent, remakevalue
+
+WHEEL_HID = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wheel_hid")
+
+
+def test_axis_mapping():
+    assert valueToPercent(32767) == 100.0
+    assert remakevalue(-40000) == 0
+    assert remakevalue(32767) == 32768
+    with pytest.raises(ValueError):
+        valueToPercent(40000)
+
+def test_analysis_needs_no_pyserial():
+    # The offline tool must not pull in the driver and its serial imports
+    code = ("import sys; sys.modules['serial'] = None; "
+            "import wheeltrace; wheeltrace.mappingTables(); "
+            "assert 'wheeldriver' not in sys.modules")
+    pytest.importorskip("numpy")
+    subprocess.run([sys.executable, "-c", code], cwd=WHEEL_HID, check=True)
+
+def test_writer_round_trip(tmp_path):
+    np = pytest.importorskip("numpy")
+    from wheeltrace import TraceWriter, loadTrace, FLUSH_RECORDS, FLAG_EMITTED
+
+    path = str(tmp_path / "trace.bin")
+    trace = TraceWriter(path)
+    total = 0
+    # Several buffers' worth, so the writer thread has to take over
+    for read in range(FLUSH_RECORDS + 7):
+        samples = [read, read + 1, read + 2]
+        value = trace.process(samples, 3, offset=10)
+        assert value == read + 12
+        trace.commit(1_000_000 * read, 1_000_000 * read + 5_000)
+        total += 3
+    trace.close()
+
+    records, header = loadTrace(path)
+    assert len(records) == total
+    assert np.array_equal(records["seq"], np.arange(total))
+    assert np.array_equal(records["emitted"] - records["raw"], np.full(total, 10))
+    assert np.all(records["latency"] == 5_000)
+    assert np.array_equal(records["flags"] & FLAG_EMITTED, np.tile([0, 0, 1], total // 3))
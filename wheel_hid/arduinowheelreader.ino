@@ -7,12 +7,33 @@
 #define REG_CONFIG       0x01
 
 #define SERIAL_BAUD      115200
-#define CONV_DELAY_MS    8
+#define CONV_TIME_US     7800  // 128 SPS: 7.8 ms nominal; OS bit polled after that
+#define CONV_TIMEOUT_US  20000 // Oscillator is ±10%, anything longer is an error
+#define CONFIG_OS        0x8000 // Config bit 15 reads 1 once no conversion is running
 
 #define PAIRING_CODE     "FSMINEWHEEL123"
 #define PAIR_INTERVAL_MS 1000
 #define STREAM_INTERVAL  10   // ~100 Hz
 
+#define BAUD_CONFIRM_MS  500   // Revert to SERIAL_BAUD if the host does not confirm
+#define PROBE_CHECK      0xA5A5
+
+#define PROBE_LINE_MAX   16    // "P65535,65535\r\n"
+#define SAMPLE_LINE_MAX  8     // "-32768\r\n"
+#define STATS_LINE_MAX   128   // 64 fixed chars + 6 counters of up to 10 digits + NUL
+
+#define ADC_CONFIG ( \
+    0x8000 | /* Start conversion */ \
+    0x0400 | /* ±4.096V */ \
+    0x0200 | /* ±2.048V */ \
+    0x0100 | /* Single-shot */ \
+    0x0080 | /* 128 SPS */ \
+    0x0003)  /* Comparator off */
+
+#define MOTOR_PIN        5     // PWM pin driving the vibration motor
+#define FF_SYNC          0xF5  // Start of a binary force feedback command
+#define FF_PACKET_LEN    6     // SYNC, cmd, strength, dur_hi, dur_lo, xor
+
 /* ---------------- STATE ---------------- */
 
 bool paired = false;
@@ -20,6 +41,44 @@ bool paired = false;
 unsigned long lastPairSend = 0;
 unsigned long lastStream = 0;
 
+/* Baud negotiation */
+const unsigned long BAUD_RATES[] = { 115200, 250000, 500000, 1000000, 2000000 };
+bool baudPending = false;
+unsigned long baudSwitchAt = 0;
+
+/* Link probe */
+uint16_t probeRemaining = 0;
+uint16_t probeSeq = 0;
+
+/* Force feedback */
+uint8_t ffBuf[FF_PACKET_LEN];
+uint8_t ffPos = 0;
+bool ffActive = false;
+bool ffTimed = false;
+unsigned long ffStopAt = 0;
+
+/* ADC state machine: start → wait → read, never blocks the loop */
+enum AdcState { ADC_IDLE, ADC_CONVERTING };
+AdcState adcState = ADC_IDLE;
+unsigned long adcStartedAt = 0;
+
+/* Newest sample not sent yet; a newer one replaces it (coalescing) */
+bool samplePending = false;
+int16_t pendingSample = 0;
+
+/* Loop timing counters, reported and reset by STATS */
+unsigned long statLoops = 0;
+unsigned long statLoopMaxUs = 0;
+unsigned long statLoopTotalUs = 0;
+unsigned long statSent = 0;
+unsigned long statCoalesced = 0;
+unsigned long statAdcErrors = 0;
+
+/* STATS reply, written out as TX space frees up */
+char statsBuf[STATS_LINE_MAX];
+uint8_t statsLen = 0;
+uint8_t statsPos = 0;
+
 /* Serial RX buffer (UNO-safe) */
 char rxBuf[64];
 uint8_t rxPos = 0;
@@ -34,36 +93,189 @@ bool writeConfig(uint16_t config) {
   return Wire.endTransmission() == 0;
 }
 
-bool readConversion(int16_t &out) {
+bool readRegister(uint8_t reg, uint16_t &out) {
   Wire.beginTransmission(ADS1115_ADDR);
-  Wire.write(REG_CONVERSION);
+  Wire.write(reg);
   if (Wire.endTransmission() != 0) return false;
 
   if (Wire.requestFrom(ADS1115_ADDR, (uint8_t)2) != 2) return false;
 
-  out = (int16_t)((Wire.read() << 8) | Wire.read());
+  out = ((uint16_t)Wire.read() << 8) | Wire.read();
   return true;
 }
 
-bool readADS1115(int16_t &value) {
-  uint16_t config =
-    0x8000 | // Start conversion
-    0x0400 | // ±4.096V
-    0x0200 | // ±2.048V
-    0x0100 | // Single-shot
-    0x0080 | // 128 SPS
-    0x0003;  // Comparator off
+void reportAdcError();
+
+void updateADC() {
+  switch (adcState) {
+    case ADC_IDLE:
+      if (millis() - lastStream < STREAM_INTERVAL) return;
+      lastStream = millis();
+
+      if (!writeConfig(ADC_CONFIG)) {
+        reportAdcError();
+        return;
+      }
+      adcStartedAt = micros();
+      adcState = ADC_CONVERTING;
+      break;
+
+    case ADC_CONVERTING: {
+      /* millis() has 1 ms steps, so the wait is timed in microseconds;
+         then the ADC itself says when the result is ready */
+      unsigned long elapsed = micros() - adcStartedAt;
+      if (elapsed < CONV_TIME_US) return;
+
+      uint16_t config;
+      if (!readRegister(REG_CONFIG, config)) {
+        adcState = ADC_IDLE;
+        reportAdcError();
+        return;
+      }
+      if (!(config & CONFIG_OS)) {
+        if (elapsed > CONV_TIMEOUT_US) {
+          adcState = ADC_IDLE;
+          reportAdcError();
+        }
+        return;
+      }
+      adcState = ADC_IDLE;
+
+      uint16_t raw;
+      if (!readRegister(REG_CONVERSION, raw)) {
+        reportAdcError();
+        return;
+      }
+      if (samplePending) statCoalesced++;
+      pendingSample = (int16_t)raw;
+      samplePending = true;
+      break;
+    }
+  }
+}
+
+/* ---------------- BAUD / PROBE ---------------- */
+
+bool isSupportedBaud(unsigned long rate) {
+  for (uint8_t i = 0; i < sizeof(BAUD_RATES) / sizeof(BAUD_RATES[0]); i++) {
+    if (BAUD_RATES[i] == rate) return true;
+  }
+  return false;
+}
+
+void switchBaud(unsigned long rate) {
+  Serial.flush();   // Finish sending at the old rate
+  Serial.end();
+  Serial.begin(rate);
+}
 
-  if (!writeConfig(config)) return false;
-  delay(CONV_DELAY_MS);
-  return readConversion(value);
+void sendProbe() {
+  /* One probe line per loop so commands are still serviced */
+  if (Serial.availableForWrite() < PROBE_LINE_MAX) return;
+
+  Serial.print('P');
+  Serial.print(probeSeq);
+  Serial.print(',');
+  Serial.println((uint16_t)(probeSeq ^ PROBE_CHECK));
+  probeSeq++;
+
+  if (--probeRemaining == 0) {
+    Serial.println("PROBE_END");
+  }
+}
+
+/* ---------------- FORCE FEEDBACK ---------------- */
+
+void applyFF() {
+  uint8_t check = ffBuf[1] ^ ffBuf[2] ^ ffBuf[3] ^ ffBuf[4];
+  if (check != ffBuf[5]) return;   // Corrupted, wait for the next command
+
+  if (ffBuf[1] == 'P' && ffBuf[2] > 0) {
+    uint16_t duration = ((uint16_t)ffBuf[3] << 8) | ffBuf[4];
+    analogWrite(MOTOR_PIN, ffBuf[2]);
+    ffActive = true;
+    ffTimed = duration != 0;
+    ffStopAt = millis() + duration;
+  }
+  else {
+    analogWrite(MOTOR_PIN, 0);
+    ffActive = false;
+  }
+}
+
+void updateFF() {
+  /* Timed effects stop on their own, even if the host goes away */
+  if (ffActive && ffTimed && (long)(millis() - ffStopAt) >= 0) {
+    analogWrite(MOTOR_PIN, 0);
+    ffActive = false;
+  }
+}
+
+/* ---------------- BOUNDED TX ---------------- */
+
+/* Streaming output only goes out when it fits into the TX buffer,
+   so Serial never blocks the loop. Replies to commands are rare and
+   short and still use println. */
+
+bool statsBusy() {
+  return statsPos < statsLen;
+}
+
+void sendSample() {
+  if (!samplePending || statsBusy()) return;
+  if (Serial.availableForWrite() < SAMPLE_LINE_MAX) return;
+
+  Serial.println(pendingSample);
+  samplePending = false;
+  statSent++;
+}
+
+void reportAdcError() {
+  statAdcErrors++;
+  if (!statsBusy() && Serial.availableForWrite() >= 23) {
+    Serial.println("ERROR:ADC_READ_FAILED");
+  }
+}
+
+void queueStats() {
+  unsigned long avgUs = statLoops ? statLoopTotalUs / statLoops : 0;
+  statsLen = snprintf(statsBuf, sizeof(statsBuf),
+    "STATS:loops=%lu,maxLoopUs=%lu,avgLoopUs=%lu,sent=%lu,coalesced=%lu,adcErrors=%lu\r\n",
+    statLoops, statLoopMaxUs, avgUs, statSent, statCoalesced, statAdcErrors);
+  if (statsLen >= sizeof(statsBuf)) {
+    /* Can't happen with STATS_LINE_MAX, but never send a line without its end */
+    statsLen = sizeof(statsBuf) - 1;
+    statsBuf[statsLen - 2] = '\r';
+    statsBuf[statsLen - 1] = '\n';
+  }
+  statsPos = 0;
+
+  statLoops = statLoopMaxUs = statLoopTotalUs = 0;
+  statSent = statCoalesced = statAdcErrors = 0;
+}
+
+void sendStats() {
+  int room = Serial.availableForWrite();
+  while (statsBusy() && room-- > 0) {
+    Serial.write(statsBuf[statsPos++]);
+  }
 }
 
 /* ---------------- SERIAL HANDLING ---------------- */
 
 void handleSerial() {
   while (Serial.available()) {
-    char c = Serial.read();
+    uint8_t c = Serial.read();
+
+    /* Binary FF command: collected byte by byte, never blocks */
+    if (ffPos > 0 || c == FF_SYNC) {
+      ffBuf[ffPos++] = c;
+      if (ffPos == FF_PACKET_LEN) {
+        applyFF();
+        ffPos = 0;
+      }
+      continue;
+    }
 
     if (c == '\n' || c == '\r') {
       rxBuf[rxPos] = 0;
@@ -75,12 +287,42 @@ void handleSerial() {
       else if (strcmp(rxBuf, "RESET_PAIRING") == 0) {
         paired = false;
         Serial.println("PAIRING_RESET");
+        switchBaud(SERIAL_BAUD);
+        baudPending = false;
+        analogWrite(MOTOR_PIN, 0);
+        ffActive = false;
+        samplePending = false;
+        adcState = ADC_IDLE;
+      }
+      else if (strncmp(rxBuf, "BAUD:", 5) == 0) {
+        unsigned long rate = strtoul(rxBuf + 5, NULL, 10);
+        if (isSupportedBaud(rate)) {
+          Serial.print("BAUD_OK:");
+          Serial.println(rate);
+          switchBaud(rate);
+          baudPending = (rate != SERIAL_BAUD);
+          baudSwitchAt = millis();
+        } else {
+          Serial.print("BAUD_ERR:");
+          Serial.println(rate);
+        }
+      }
+      else if (strcmp(rxBuf, "BAUD_CHECK") == 0) {
+        baudPending = false;
+        Serial.println("BAUD_CONFIRMED");
+      }
+      else if (strcmp(rxBuf, "STATS") == 0) {
+        if (!statsBusy()) queueStats();
+      }
+      else if (strncmp(rxBuf, "PROBE:", 6) == 0) {
+        probeRemaining = (uint16_t)strtoul(rxBuf + 6, NULL, 10);
+        probeSeq = 0;
       }
 
       rxPos = 0;
     }
     else if (rxPos < sizeof(rxBuf) - 1) {
-      rxBuf[rxPos++] = c;
+      rxBuf[rxPos++] = (char)c;
     }
   }
 }
@@ -90,6 +332,8 @@ void handleSerial() {
 void setup() {
   Serial.begin(SERIAL_BAUD);
   Wire.begin();
+  pinMode(MOTOR_PIN, OUTPUT);
+  analogWrite(MOTOR_PIN, 0);
   delay(300); // USB settle
 
   Serial.println("BOOT_OK");
@@ -97,11 +341,28 @@ void setup() {
 
 /* ---------------- LOOP ---------------- */
 
-void loop() {
+/* Cooperative scheduler: every task returns quickly, none of them waits */
+void runTasks() {
   handleSerial();
+  updateFF();
+  sendStats();
+
+  /* Host never confirmed the new rate: go back to the default */
+  if (baudPending) {
+    if (millis() - baudSwitchAt > BAUD_CONFIRM_MS) {
+      switchBaud(SERIAL_BAUD);
+      baudPending = false;
+    }
+    return;
+  }
+
+  if (probeRemaining) {
+    sendProbe();
+    return;
+  }
 
   /* Send pairing request periodically until paired */
-  if (!paired && millis() - lastPairSend > PAIR_INTERVAL_MS) {
+  if (!paired && millis() - lastPairSend > PAIR_INTERVAL_MS && !statsBusy()) {
     Serial.print("PAIRING_REQUEST:");
     Serial.println(PAIRING_CODE);
     lastPairSend = millis();
@@ -110,15 +371,16 @@ void loop() {
   if (!paired) return;
 
   /* Stream RAW ADC */
-  if (millis() - lastStream >= STREAM_INTERVAL) {
-    lastStream = millis();
+  updateADC();
+  sendSample();
+}
 
-    int16_t raw;
-    if (!readADS1115(raw)) {
-      Serial.println("ERROR:ADC_READ_FAILED");
-      return;
-    }
+void loop() {
+  unsigned long start = micros();
+  runTasks();
+  unsigned long took = micros() - start;
 
-    Serial.println(raw);
-  }
+  statLoops++;
+  statLoopTotalUs += took;
+  if (took > statLoopMaxUs) statLoopMaxUs = took;
 }
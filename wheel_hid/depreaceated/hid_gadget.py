@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+# USB HID gadget bring-up without prompts or shell commands.
+#
+# Every configfs attribute is written with plain file I/O, and only if its
+# current value differs, so running this again on a configured board does
+# nothing (no unbind, no re-enumeration on the PC). All paths can be moved
+# with `root`, `udc_dir` and `device`, so the whole thing also runs
+# against an ordinary temporary directory laid out like configfs.
+#
+# Under systemd the gadget unit is a oneshot: ExecStart only returns
+# (successfully) once /dev/hidg0 exists, so the HID loop ordered after it
+# starts when the device is ready:
+#
+#   # wheel-gadget.service
+#   [Service]
+#   Type=oneshot
+#   RemainAfterExit=yes
+#   ExecStart=/usr/bin/python3 /opt/wheel/automated_I2C_Gadget_Setup.py --udev
+#
+#   # wheel-hid.service
+#   [Unit]
+#   Requires=wheel-gadget.service
+#   After=wheel-gadget.service
+#   [Service]
+#   ExecStart=/usr/bin/python3 /opt/wheel/wheel_hid.py --auto
+
+import os
+import sys
+import time
+import errno
+import subprocess
+
+# ---------------- PATHS ----------------
+
+GADGET_DIR = "/sys/kernel/config/usb_gadget"
+GADGET_NAME = "wheel"
+UDC_DIR = "/sys/class/udc"
+HID_DEVICE = "/dev/hidg0"
+UDEV_RULE = "/etc/udev/rules.d/99-hidg.rules"
+UDEV_RULE_TEXT = 'KERNEL=="hidg0", MODE="0666"\n'
+
+DEVICE_TIMEOUT = 5.0
+
+# ---------------- GADGET ----------------
+
+# HID report descriptor: one 16-bit signed Y axis
+REPORT_DESC = bytes((
+    0x05, 0x01,         # Usage Page (Generic Desktop)
+    0x09, 0x04,         # Usage (Joystick)
+    0xA1, 0x01,         # Collection (Application)
+    0x09, 0x01,         #   Usage (Pointer)
+    0xA1, 0x00,         #   Collection (Physical)
+    0x05, 0x01,         #     Usage Page (Generic Desktop)
+    0x09, 0x31,         #     Usage (Y)
+    0x16, 0x01, 0x80,   #     Logical Minimum (-32767)
+    0x26, 0xFF, 0x7F,   #     Logical Maximum (32767)
+    0x75, 0x10,         #     Report Size (16)
+    0x95, 0x01,         #     Report Count (1)
+    0x81, 0x02,         #     Input (Data, Var, Abs)
+    0xC0,               #   End Collection
+    0xC0,               # End Collection
+))
+
+FUNCTION = "functions/hid.usb0"
+CONFIG = "configs/c.1"
+
+# (path inside the gadget, value) in the order they have to be written
+ATTRIBUTES = (
+    ("idVendor", "0x1d6b"),
+    ("idProduct", "0x0104"),
+    ("bcdDevice", "0x0100"),
+    ("bcdUSB", "0x0200"),
+    ("strings/0x409/serialnumber", "0001"),
+    ("strings/0x409/manufacturer", "Le Potato"),
+    ("strings/0x409/product", "Wheel HID"),
+    (FUNCTION + "/protocol", "1"),
+    (FUNCTION + "/subclass", "1"),
+    (FUNCTION + "/report_length", "2"),
+    (FUNCTION + "/report_desc", REPORT_DESC),
+    (CONFIG + "/strings/0x409/configuration", "Wheel Config"),
+    (CONFIG + "/MaxPower", "250"),
+)
+
+
+class GadgetError(RuntimeError):
+    pass
+
+
+# ---------------- CONFIGFS I/O ----------------
+
+def read_attr(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def same_value(current, value):
+    # configfs appends a newline to text attributes, binary ones come back as written
+    if current is None:
+        return False
+    if isinstance(value, bytes):
+        return current == value
+    return current.rstrip(b"\n") == value.encode("utf-8")
+
+def write_attr(path, value):
+    # One write() per attribute, which is what configfs expects
+    data = value if isinstance(value, bytes) else value.encode("utf-8") + b"\n"
+    with open(path, "wb", buffering=0) as f:
+        f.write(data)
+
+def gadget_path(root=GADGET_DIR, name=GADGET_NAME):
+    return os.path.join(root, name)
+
+def pending_changes(path):
+    # What differs from the wanted gadget: a list of ("mkdir"|"attr"|"link", relative path)
+    changes = []
+    if not os.path.isdir(path):
+        changes.append(("mkdir", ""))
+    for rel, value in ATTRIBUTES:
+        directory = os.path.dirname(rel)
+        if directory and not os.path.isdir(os.path.join(path, directory)) \
+                and ("mkdir", directory) not in changes:
+            changes.append(("mkdir", directory))
+        if not same_value(read_attr(os.path.join(path, rel)), value):
+            changes.append(("attr", rel))
+    # A function attribute can only change while the function is not linked
+    link = os.path.join(path, CONFIG, os.path.basename(FUNCTION))
+    function_changed = any(kind == "attr" and rel.startswith(FUNCTION + "/") for kind, rel in changes)
+    if function_changed or not os.path.islink(link) \
+            or os.path.realpath(link) != os.path.realpath(os.path.join(path, FUNCTION)):
+        changes.append(("link", os.path.join(CONFIG, os.path.basename(FUNCTION))))
+    return changes
+
+def apply_changes(path, changes):
+    # f_hid rejects attribute writes with EBUSY while the function is linked
+    # into a config (even with the UDC unbound), so the link goes first and
+    # is made again after the attributes
+    values = dict(ATTRIBUTES)
+    for kind, rel in changes:
+        target = os.path.join(path, rel)
+        if kind == "link" and os.path.lexists(target):
+            os.unlink(target)
+    for kind, rel in changes:
+        target = os.path.join(path, rel)
+        if kind == "mkdir":
+            os.makedirs(target, exist_ok=True)
+        elif kind == "attr":
+            write_attr(target, values[rel])
+        elif kind == "link":
+            os.symlink(os.path.join(path, FUNCTION), target)
+
+# ---------------- UDC ----------------
+
+def bound_udc(path):
+    current = read_attr(os.path.join(path, "UDC"))
+    return current.strip().decode("utf-8", errors="ignore") if current else ""
+
+def pick_udc(udc=None, udc_dir=UDC_DIR):
+    try:
+        available = sorted(os.listdir(udc_dir))
+    except FileNotFoundError:
+        available = []
+    if udc:
+        if udc not in available:
+            raise GadgetError(f"USB device controller {udc} not found in {udc_dir}")
+        return udc
+    if not available:
+        raise GadgetError(f"No USB device controller in {udc_dir} (OTG port disabled?)")
+    return available[0]
+
+def set_udc(path, udc):
+    # Writing "" unbinds. Binding the same controller twice is EBUSY, so check first.
+    if bound_udc(path) == udc:
+        return False
+    write_attr(os.path.join(path, "UDC"), udc)
+    return True
+
+# ---------------- SETUP ----------------
+
+def load_libcomposite(root=GADGET_DIR):
+    # The only subprocess, and only when configfs has no usb_gadget dir yet
+    if os.path.isdir(root):
+        return False
+    result = subprocess.run(["modprobe", "libcomposite"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0 or not os.path.isdir(root):
+        raise GadgetError(f"libcomposite not available ({result.stderr.decode(errors='ignore').strip()})")
+    return True
+
+def setup_gadget(root=GADGET_DIR, name=GADGET_NAME, udc=None, udc_dir=UDC_DIR, log=print):
+    # Brings the gadget to the wanted state; returns the list of changes made.
+    # A bound gadget is only unbound when one of its attributes has to change.
+    path = gadget_path(root, name)
+    changes = pending_changes(path)
+    controller = pick_udc(udc, udc_dir)
+
+    if changes:
+        if bound_udc(path):
+            log(f"Unbinding {name} to update it")
+            set_udc(path, "")
+        apply_changes(path, changes)
+        for kind, rel in changes:
+            log(f"{kind:<5} {rel or path}")
+    if set_udc(path, controller):
+        log(f"Bound {name} to {controller}")
+        changes.append(("udc", controller))
+    return changes
+
+def remove_gadget(root=GADGET_DIR, name=GADGET_NAME):
+    # configfs teardown order: unbind, links, config strings, configs,
+    # functions, gadget strings, gadget. Attribute files vanish with their
+    # directory on configfs; in a plain directory tree they are removed first.
+    path = gadget_path(root, name)
+    if not os.path.isdir(path):
+        return False
+    if bound_udc(path):
+        set_udc(path, "")
+    link = os.path.join(path, CONFIG, os.path.basename(FUNCTION))
+    if os.path.islink(link):
+        os.unlink(link)
+    for rel in (CONFIG + "/strings/0x409", CONFIG, FUNCTION, "strings/0x409", ""):
+        _rmdir(os.path.join(path, rel))
+    return True
+
+def _rmdir(path):
+    if not os.path.isdir(path):
+        return
+    try:
+        os.rmdir(path)
+    except OSError as e:
+        if e.errno != errno.ENOTEMPTY:
+            raise
+        # Plain directory: attribute files and default groups are real entries
+        for entry in os.listdir(path):
+            entry = os.path.join(path, entry)
+            if os.path.isdir(entry) and not os.path.islink(entry):
+                _rmdir(entry)
+            else:
+                os.unlink(entry)
+        os.rmdir(path)
+
+def install_udev_rule(path=UDEV_RULE, text=UDEV_RULE_TEXT):
+    # Rewrites the rule and reloads udev only if it changed
+    current = read_attr(path)
+    if current is not None and current.decode("utf-8", errors="ignore") == text:
+        return False
+    with open(path, "w") as f:
+        f.write(text)
+    subprocess.run(["udevadm", "control", "--reload-rules"], check=False)
+    subprocess.run(["udevadm", "trigger", "--subsystem-match=hidg"], check=False)
+    return True
+
+def wait_for_device(device=HID_DEVICE, timeout=DEVICE_TIMEOUT, interval=0.01):
+    # The device node shows up shortly after binding (udev creates it)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(device):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create or remove the wheel HID gadget (idempotent)")
+    parser.add_argument("--root", default=GADGET_DIR, help="configfs usb_gadget directory")
+    parser.add_argument("--name", default=GADGET_NAME, help="Gadget name")
+    parser.add_argument("--udc", help="USB device controller (default: first in --udc-dir)")
+    parser.add_argument("--udc-dir", default=UDC_DIR, help="Directory listing the controllers")
+    parser.add_argument("--device", default=HID_DEVICE, help="HID device node to wait for")
+    parser.add_argument("--remove", action="store_true", help="Unbind and remove the gadget")
+    args = parser.parse_args()
+
+    try:
+        if args.remove:
+            print("Gadget removed." if remove_gadget(args.root, args.name) else "No gadget found.")
+            sys.exit(0)
+        setup_gadget(args.root, args.name, args.udc, args.udc_dir)
+        if not wait_for_device(args.device):
+            raise GadgetError(f"{args.device} did not appear")
+    except (GadgetError, OSError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"{args.device} ready")
@@ -3,14 +3,14 @@
 import os
 import sys
 import time
-import json
 import subprocess
 import termios
 import tty
 import select
 
-CONFIG_DIR = os.path.expanduser("~/.wheel_hid")
-CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+from wheel_settings import (CONFIG_DIR, SettingsError, load_config_file, save_config,
+                            from_config, to_config, validate, defaults, parse_value)
+
 VENV_DIR = os.path.join(CONFIG_DIR, "joystickenv")
 
 DEFAULT_I2C_BUS = "1"
@@ -89,15 +89,27 @@ def install_dependencies():
 # -------------------------------------------------
 
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_config(cfg):
-    os.makedirs(CONFIG_DIR, exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(cfg, f, indent=2)
+    try:
+        return load_config_file()
+    except SettingsError as e:
+        print(f"Ignoring saved config: {e}")
+        return {}
+
+def save_settings(cfg, **values):
+    # Validates the merged result before anything is written
+    settings = defaults()
+    settings.update(from_config(cfg))
+    settings.update(values)
+    try:
+        settings = validate(settings)
+    except SettingsError as e:
+        print("Not saved:")
+        for error in e.errors:
+            print(f" - {error}")
+        return cfg
+    cfg = to_config({name: settings[name] for name in values}, cfg)
+    save_config(cfg)
+    return cfg
 
 # -------------------------------------------------
 # I2C helpers
@@ -164,7 +176,8 @@ def main():
     cfg = load_config()
 
     if "address" in cfg and ask_yn("Load saved sensor address?"):
-        addr = int(cfg["address"], 16)
+        # Same parsing as wheel_settings: "48" and "0x48" are both 0x48
+        addr = parse_value("address", cfg["address"])
         print(f"Using saved address: {hex(addr)}")
     else:
         if ask_yn("Do you know the sensor address?"):
@@ -179,8 +192,7 @@ def main():
                     sys.exit(1)
 
         if ask_yn("Save address?"):
-            cfg["address"] = hex(addr)
-            save_config(cfg)
+            cfg = save_settings(cfg, address=addr)
 
     if ask_yn("Start calibration?"):
         cal = {}
@@ -192,9 +204,7 @@ def main():
         cal["center"] = read_adc(addr)
 
         if ask_yn("Save calibration?"):
-            cfg["calibration"] = cal
-            cfg["address"] = hex(addr)
-            save_config(cfg)
+            cfg = save_settings(cfg, address=addr, **cal)
 
     print("Setup complete.")
     print(f"Virtualenv used: {'YES' if os.path.exists(VENV_DIR) else 'NO'}")
@@ -3,29 +3,15 @@
 import os
 import sys
 import time
-import json
 import struct
 import argparse
 from smbus2 import SMBus
 
-# ---------------- FILES ----------------
+from wheel_settings import (SettingsError, cache_path, add_arguments, load_settings,
+                            defaults, validate, compiled_for, describe)
 
-CONFIG_DIR = os.path.expanduser("~/.wheel_hid")
-CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
-HID_DEVICE = "/dev/hidg0"
+# ---------------- ADS1115 ----------------
 
-print(f"Config file should be at: {CONFIG_FILE}")
-
-# ---------------- DEFAULTS ----------------
-
-DEFAULT_ADDRESS = 0x48
-DEFAULT_MIN = 0
-DEFAULT_MAX = 32767
-DEFAULT_CENTER = 16384
-SMOOTHING = 0.2
-UPDATE_DELAY = 0.002
-
-I2C_BUS = 1
 REG_CONV = 0x00
 REG_CFG  = 0x01
 
@@ -45,44 +31,46 @@ def fatal(msg):
     print("\nExiting.\n")
     sys.exit(1)
 
-def load_config_file():
-    if not os.path.exists(CONFIG_FILE):
-        return None
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
-
-def get_manual_config():
-    return {
-        "address": int(input("Enter Address (hex, e.g. 0x48): "), 16),
-        "max": int(input("Enter Max: ")),
-        "min": int(input("Enter Min: ")),
-        "center": int(input("Enter Center: "))
-    }
-
-def get_defaults():
-    return {
-        "address": DEFAULT_ADDRESS,
-        "min": DEFAULT_MIN,
-        "max": DEFAULT_MAX,
-        "center": DEFAULT_CENTER,
-    }
-
-def clamp(v, lo, hi):
-    return max(lo, min(hi, v))
-
-def map_range(x, in_min, in_max, out_min, out_max):
-    return int((x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min)
-
-def load_from_config(cfg):
-    try:
-        return {
-            "address": int(cfg["address"], 16),
-            "min": int(cfg["calibration"]["min"]),
-            "max": int(cfg["calibration"]["max"]),
-            "center": int(cfg["calibration"]["center"]),
-        }
-    except Exception:
-        return None
+def settings_fatal(e):
+    fatal("Invalid settings:\n" + "\n".join(f" - {error}" for error in e.errors))
+
+def get_manual_config(base):
+    cfg = dict(base)
+    cfg.update({
+        "address": input("Enter Address (hex, e.g. 0x48): "),
+        "max": input("Enter Max: "),
+        "min": input("Enter Min: "),
+        "center": input("Enter Center: "),
+    })
+    return validate(cfg)
+
+def select_config(args):
+    # --auto never prompts: saved config plus overrides, or exit
+    if args.auto:
+        try:
+            return load_settings(args, require_file=True)
+        except SettingsError as e:
+            settings_fatal(e)
+
+    if ask_yn("Load config?"):
+        if os.path.exists(args.config):
+            print("Loading config...")
+            try:
+                return load_settings(args)
+            except SettingsError as e:
+                print(f"Config invalid ({'; '.join(e.errors)}), using defaults.")
+        else:
+            print(f"No config found at {args.config}.")
+        return validate(defaults())
+
+    if ask_yn("OK use default values?"):
+        print("Ok using default values")
+        return validate(defaults())
+    while True:
+        try:
+            return get_manual_config(defaults())
+        except SettingsError as e:
+            print("\n".join(e.errors))
 
 # ---------- ADS1115 (SMBus) ----------
 
@@ -121,58 +109,27 @@ def main():
                         help="Automatically load saved config and start")
     parser.add_argument("--test", action="store_true",
                         help="Print raw ADC value every 250ms and exit")
-    args = parser.parse_args()
+    args = add_arguments(parser).parse_args()
 
     # ---------- CONFIG SELECTION ----------
-    cfg = None
-
-    if args.auto:
-        cfg_file = load_config_file()
-        if not cfg_file:
-            fatal("--auto specified but no config found.")
-
-        cfg = load_from_config(cfg_file)
-        if not cfg:
-            fatal("Config file exists but is invalid or incomplete.")
-
-        print("Auto mode: loading config...")
-
-    else:
-        if ask_yn("Load config?"):
-            cfg_file = load_config_file()
-            if cfg_file:
-                print("Loading config...")
-                cfg = load_from_config(cfg_file)
-                if not cfg:
-                    print("Config invalid, using defaults.")
-                    cfg = get_defaults()
-            else:
-                print("No config found.")
-                cfg = get_defaults()
-        else:
-            if ask_yn("OK use default values?"):
-                print("Ok using default values")
-                cfg = get_defaults()
-            else:
-                cfg = get_manual_config()
+    cfg = select_config(args)
 
     address = cfg["address"]
-    adc_min = cfg["min"]
-    adc_max = cfg["max"]
-    adc_center = cfg["center"]
+    i2c_bus = cfg["i2c_bus"]
+    hid_device = cfg["hid_device"]
 
     print("\nUsing:")
-    print(f" Address : {hex(address)}")
-    print(f" Min     : {adc_min}")
-    print(f" Max     : {adc_max}")
-    print(f" Center  : {adc_center}\n")
+    print(describe(cfg) + "\n")
+
+    # Lookup table and filter coefficients, from the cache when the settings are unchanged
+    compiled = compiled_for(cfg, cache_path(args.config), rebuild=args.no_cache)
 
     # ---------- I2C OPEN ----------
     try:
-        bus = SMBus(I2C_BUS)
+        bus = SMBus(i2c_bus)
     except FileNotFoundError:
         fatal(
-            f"/dev/i2c-{I2C_BUS} not found.\n\n"
+            f"/dev/i2c-{i2c_bus} not found.\n\n"
             "Possible causes:\n"
             " - I2C not enabled in armbian-config\n"
             " - Wrong I2C bus number\n"
@@ -180,7 +137,7 @@ def main():
         )
     except PermissionError:
         fatal(
-            f"Permission denied opening /dev/i2c-{I2C_BUS}.\n\n"
+            f"Permission denied opening /dev/i2c-{i2c_bus}.\n\n"
             "Fix with:\n"
             " sudo usermod -aG i2c $USER\n"
             " then log out and back in"
@@ -198,9 +155,9 @@ def main():
             sys.exit(0)
 
     # ---------- HID OPEN ----------
-    if not os.path.exists(HID_DEVICE):
+    if not os.path.exists(hid_device):
         fatal(
-            f"{HID_DEVICE} does not exist.\n\n"
+            f"{hid_device} does not exist.\n\n"
             "Possible causes:\n"
             " - HID gadget not created\n"
             " - Gadget not bound to USB controller\n"
@@ -209,31 +166,38 @@ def main():
         )
 
     try:
-        hid = open(HID_DEVICE, "wb", buffering=0)
+        hid = open(hid_device, "wb", buffering=0)
     except PermissionError:
         fatal(
-            f"Permission denied opening {HID_DEVICE}.\n\n"
+            f"Permission denied opening {hid_device}.\n\n"
             "Fix with:\n"
-            " sudo chmod 666 /dev/hidg0\n"
+            f" sudo chmod 666 {hid_device}\n"
             " or add a udev rule"
         )
 
     # ---------- HID LOOP ----------
+    table = compiled["table"]
+    offset = compiled["offset"]
+    last_index = len(table) - 1
+    keep = compiled["keep"]
+    take = compiled["take"]
+    delay = cfg["update_delay"]
+    report = struct.Struct("<h")
+
     with hid:
         last = 0.0
         while True:
-            raw = clamp(read_ads1115(bus, address), adc_min, adc_max)
-
-            if raw >= adc_center:
-                mapped = map_range(raw, adc_center, adc_max, 0, 32767)
-            else:
-                mapped = map_range(raw, adc_min, adc_center, -32767, 0)
+            index = read_ads1115(bus, address) - offset
+            if index < 0:
+                index = 0
+            elif index > last_index:
+                index = last_index
 
-            out = last * SMOOTHING + mapped * (1.0 - SMOOTHING)
+            out = last * keep + table[index] * take
             last = out
 
-            hid.write(struct.pack("<h", int(out)))
-            time.sleep(UPDATE_DELAY)
+            hid.write(report.pack(int(out)))
+            time.sleep(delay)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+# Settings for wheel_hid.py and setup_wheel_hid.py.
+#
+# Values come from, in increasing priority:
+#   defaults < ~/.wheel_hid/config.json < WHEEL_HID_* environment < command line
+#
+# Everything derived from them (the raw → axis lookup table and the
+# smoothing coefficients) is compiled once and cached next to the config,
+# keyed by a hash of the settings, so `wheel_hid.py --auto` can go straight
+# to the HID loop.
+#
+#   python3 wheel_settings.py            show the effective settings
+#   python3 wheel_settings.py --check    validate only (exit code 1 on errors)
+
+import os
+import sys
+import json
+import copy
+import array
+import hashlib
+import argparse
+
+# ---------------- FILES ----------------
+
+CONFIG_DIR = os.path.expanduser("~/.wheel_hid")
+CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+
+def cache_path(config_path=CONFIG_FILE):
+    # The compiled cache lives next to the config it was built from
+    return os.path.join(os.path.dirname(os.path.abspath(config_path)), "compiled.bin")
+
+CACHE_FILE = cache_path(CONFIG_FILE)
+
+ENV_PREFIX = "WHEEL_HID_"
+
+# ---------------- SCHEMA ----------------
+# name: (type, default, lowest, highest, config.json path, help)
+# Addresses are stored as hex strings in config.json ("0x48"), the
+# calibration values under "calibration" as written by setup_wheel_hid.py.
+
+AXIS_MIN = -32767
+AXIS_MAX = 32767
+
+SCHEMA = {
+    "address":      (int,   0x48,         0x03,   0x77,   ("address",),              "ADS1115 I2C address"),
+    "min":          (int,   0,            -32768, 32767,  ("calibration", "min"),    "Raw ADC value at full left"),
+    "max":          (int,   32767,        -32768, 32767,  ("calibration", "max"),    "Raw ADC value at full right"),
+    "center":       (int,   16384,        -32768, 32767,  ("calibration", "center"), "Raw ADC value at center"),
+    "smoothing":    (float, 0.2,          0.0,    0.99,   ("smoothing",),            "Weight of the previous output (0 = off)"),
+    "update_delay": (float, 0.002,        0.0,    1.0,    ("update_delay",),         "Seconds between HID reports"),
+    "i2c_bus":      (int,   1,            0,      255,    ("i2c_bus",),              "I2C bus number (/dev/i2c-N)"),
+    "hid_device":   (str,   "/dev/hidg0", None,   None,   ("hid_device",),           "HID gadget device"),
+}
+
+# Bump when the compiled layout or the transform changes
+CACHE_MAGIC = b"WHC1"
+CACHE_VERSION = 1
+# Only these settings change the compiled values
+COMPILED_FROM = ("min", "center", "max", "smoothing")
+
+
+class SettingsError(ValueError):
+    # Carries every problem found, so all of them can be shown at once
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("\n".join(self.errors))
+
+
+def defaults():
+    return {name: spec[1] for name, spec in SCHEMA.items()}
+
+def parse_value(name, value):
+    kind = SCHEMA[name][0]
+    if kind is int and isinstance(value, str):
+        # Addresses are always hex ("48" and "0x48"), other numbers may use a prefix
+        return int(value.strip(), 16 if name == "address" else 0)
+    if kind is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"expected a whole number, got {value}")
+    return kind(value)
+
+def validate(settings):
+    # Returns a new dict with converted values; raises SettingsError
+    errors = []
+    result = {}
+    for name, (kind, default, lo, hi, _, _) in SCHEMA.items():
+        value = settings.get(name, default)
+        try:
+            value = parse_value(name, value)
+        except (TypeError, ValueError):
+            errors.append(f"{name}: {value!r} is not a valid {kind.__name__}")
+            continue
+        if lo is not None and not lo <= value <= hi:
+            errors.append(f"{name}: {value} is outside {lo}..{hi}")
+            continue
+        result[name] = value
+
+    unknown = sorted(set(settings) - set(SCHEMA))
+    for name in unknown:
+        errors.append(f"{name}: unknown setting")
+
+    if not errors and not result["min"] < result["center"] < result["max"]:
+        errors.append(f"calibration: expected min < center < max, got "
+                      f"{result['min']} / {result['center']} / {result['max']}")
+    if errors:
+        raise SettingsError(errors)
+    return result
+
+# ---------------- SOURCES ----------------
+
+def load_config_file(path=CONFIG_FILE):
+    # Raw config.json contents, {} if there is none
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SettingsError([f"{path}: {e}"])
+    if not isinstance(cfg, dict):
+        raise SettingsError([f"{path}: expected a JSON object"])
+    return cfg
+
+def save_config(cfg, path=CONFIG_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cfg, f, indent=2)
+    os.replace(tmp, path)
+
+def from_config(cfg):
+    # Flattens config.json into setting names; missing keys are left out
+    settings = {}
+    for name, spec in SCHEMA.items():
+        node = cfg
+        for key in spec[4]:
+            if not isinstance(node, dict) or key not in node:
+                break
+            node = node[key]
+        else:
+            settings[name] = node
+    return settings
+
+def to_config(settings, cfg=None):
+    # Writes settings back into the config.json layout, keeping other keys
+    cfg = copy.deepcopy(cfg or {})
+    for name, value in settings.items():
+        path = SCHEMA[name][4]
+        node = cfg
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = hex(value) if name == "address" else value
+    return cfg
+
+def from_env(environ=os.environ):
+    # WHEEL_HID_ADDRESS=0x49, WHEEL_HID_UPDATE_DELAY=0.001, ...
+    return {name: environ[ENV_PREFIX + name.upper()]
+            for name in SCHEMA if ENV_PREFIX + name.upper() in environ}
+
+def add_arguments(parser):
+    # Command line overrides, one option per setting (--update-delay, ...)
+    group = parser.add_argument_group("settings (override config.json and WHEEL_HID_*)")
+    group.add_argument("--config", default=os.environ.get(ENV_PREFIX + "CONFIG", CONFIG_FILE),
+                       help=f"Config file (default {CONFIG_FILE})")
+    group.add_argument("--no-cache", action="store_true", help="Recompile derived values even if cached")
+    for name, spec in SCHEMA.items():
+        group.add_argument("--" + name.replace("_", "-"), dest="setting_" + name,
+                           metavar=spec[0].__name__.upper(), help=spec[5])
+    return parser
+
+def from_args(args):
+    return {name: getattr(args, "setting_" + name) for name in SCHEMA
+            if getattr(args, "setting_" + name, None) is not None}
+
+def load_settings(args=None, path=None, environ=os.environ, require_file=False):
+    # Merges every source and validates the result
+    path = path or getattr(args, "config", None) or CONFIG_FILE
+    if require_file and not os.path.exists(path):
+        raise SettingsError([f"{path}: not found (run setup_wheel_hid.py first)"])
+    settings = defaults()
+    settings.update(from_config(load_config_file(path)))
+    settings.update(from_env(environ))
+    if args is not None:
+        settings.update(from_args(args))
+    return validate(settings)
+
+# ---------------- COMPILED VALUES ----------------
+
+def settings_hash(settings):
+    canonical = json.dumps({name: settings[name] for name in COMPILED_FROM},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{CACHE_VERSION}:{canonical}".encode("utf-8")).digest()
+
+def map_range(x, in_min, in_max, out_min, out_max):
+    return int((x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min)
+
+def build_table(adc_min, adc_center, adc_max):
+    # table[raw - adc_min] is the axis value for every raw reading in range
+    table = array.array("h", bytes(2 * (adc_max - adc_min + 1)))
+    for raw in range(adc_min, adc_max + 1):
+        if raw >= adc_center:
+            mapped = map_range(raw, adc_center, adc_max, 0, AXIS_MAX)
+        else:
+            mapped = map_range(raw, adc_min, adc_center, AXIS_MIN, 0)
+        table[raw - adc_min] = mapped
+    return table
+
+def compile_settings(settings):
+    return {
+        "hash": settings_hash(settings),
+        "table": build_table(settings["min"], settings["center"], settings["max"]),
+        "offset": settings["min"],
+        # out = last * keep + mapped * take
+        "keep": settings["smoothing"],
+        "take": 1.0 - settings["smoothing"],
+    }
+
+def save_compiled(compiled, path=CACHE_FILE):
+    # magic, version u16, 32-byte hash, then the table as native int16
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(CACHE_MAGIC + CACHE_VERSION.to_bytes(2, "little") + compiled["hash"])
+        compiled["table"].tofile(f)
+    os.replace(tmp, path)
+
+def load_compiled(settings, path=CACHE_FILE):
+    # Returns the cached values if they were built from exactly these settings
+    digest = settings_hash(settings)
+    try:
+        with open(path, "rb") as f:
+            header = f.read(len(CACHE_MAGIC) + 2 + len(digest))
+            if header != CACHE_MAGIC + CACHE_VERSION.to_bytes(2, "little") + digest:
+                return None
+            table = array.array("h")
+            table.frombytes(f.read())
+    except OSError:
+        return None
+    if len(table) != settings["max"] - settings["min"] + 1:
+        return None
+    return {
+        "hash": digest,
+        "table": table,
+        "offset": settings["min"],
+        "keep": settings["smoothing"],
+        "take": 1.0 - settings["smoothing"],
+    }
+
+def compiled_for(settings, path=CACHE_FILE, rebuild=False):
+    # Cached values when possible, otherwise compile and store them.
+    # A read-only config dir is not an error, the values are just rebuilt.
+    compiled = None if rebuild else load_compiled(settings, path)
+    if compiled is None:
+        compiled = compile_settings(settings)
+        try:
+            save_compiled(compiled, path)
+        except OSError:
+            pass
+    return compiled
+
+def describe(settings):
+    return "\n".join(
+        f" {name:<13}: {hex(value) if name == 'address' else value}" for name, value in settings.items())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or check the wheel_hid settings")
+    parser.add_argument("--check", action="store_true", help="Only validate, print errors")
+    args = add_arguments(parser).parse_args()
+    try:
+        settings = load_settings(args)
+    except SettingsError as e:
+        print("Invalid settings:")
+        for error in e.errors:
+            print(f" - {error}")
+        sys.exit(1)
+    if args.check:
+        print("Settings OK")
+        sys.exit(0)
+    print(describe(settings))
+    compiled = compiled_for(settings, cache_path(args.config), rebuild=args.no_cache)
+    print(f" {'cache':<13}: {compiled['hash'].hex()[:16]} ({len(compiled['table'])} table entries)")
@@ -0,0 +1,18 @@
+# Axis value mapping shared by the driver and the offline tools.
+# Only plain Python here, so e.g. wheeltrace.py works without pyserial.
+
+def valueToPercent(value: int) -> float:
+    if value < -32767 or value > 32767:
+        raise ValueError("Value out of range (-32767 .. 32767)")
+
+    return (value / 32767.0) * 100.0
+
+def remakevalue(v: int) -> int:
+    # clamp input
+    if v < -32767:
+        v = -32767
+    if v > 32767:
+        v = 32767
+
+    # map -32767..32767 → 0..32768
+    return int((v + 32767) * 32768 / 65534)
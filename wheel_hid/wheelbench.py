@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+
+# Benchmarks for the wheel driver. Run one of the subcommands, e.g.:
+#   python3 wheelbench.py realtime --load 4 --seconds 10
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+
+from wheelsim import openPty
+
+
+# -------- HELPERS --------
+
+def percentile(sortedValues, pct):
+    if not sortedValues:
+        return 0.0
+    k = (len(sortedValues) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sortedValues) - 1)
+    return sortedValues[lo] + (sortedValues[hi] - sortedValues[lo]) * (k - lo)
+
+def printLatencyRow(label, samplesUs):
+    samplesUs = sorted(samplesUs)
+    print(f"{label:<22} n={len(samplesUs):<7} "
+          f"p50={percentile(samplesUs, 50):8.1f}us "
+          f"p99={percentile(samplesUs, 99):8.1f}us "
+          f"p99.9={percentile(samplesUs, 99.9):8.1f}us "
+          f"max={samplesUs[-1] if samplesUs else 0:8.1f}us")
+
+def burnCpu(stop):
+    # Synthetic CPU load: spin until told to stop
+    x = 0
+    while not stop.is_set():
+        for i in range(10000):
+            x = (x * 31 + i) & 0xFFFF
+
+def startLoad(count):
+    stop = mp.Event()
+    procs = [mp.Process(target=burnCpu, args=(stop,), daemon=True) for _ in range(count)]
+    for p in procs:
+        p.start()
+    return stop, procs
+
+def stopLoad(stop, procs):
+    stop.set()
+    for p in procs:
+        p.join(timeout=2)
+        if p.is_alive():
+            p.terminate()
+
+
+# -------- REALTIME --------
+
+def realtimeWorker(realtime, rate, seconds, cpus, result):
+    from wheelrealtime import enableRealtime, parseCpuList, HotLoopGC
+
+    hotgc = None
+    if realtime:
+        enableRealtime(cpus=parseCpuList(cpus))
+        hotgc = HotLoopGC().start()
+
+    period = 1.0 / rate
+    lateness = []
+    junk = []
+    deadline = time.perf_counter() + period
+    end = time.perf_counter() + seconds
+    while True:
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.perf_counter()
+        if now >= end:
+            break
+        lateness.append((now - deadline) * 1e6)
+
+        # Roughly what one sample costs in the driver loop, including the
+        # garbage it leaves behind
+        line = f"{int(now * 1000) & 0x7FFF}\r\n".encode().decode("utf-8", errors="ignore").strip()
+        junk.append([int(line)])
+        if len(junk) > 256:
+            junk.clear()
+
+        if hotgc:
+            hotgc.tick(now)
+        deadline += period
+        if deadline < now:
+            deadline = now + period
+
+    result.put(lateness)
+
+def benchRealtime(args):
+    print(f"Wakeup lateness of a {args.rate} Hz loop under {args.load} busy processes, {args.seconds}s per run")
+    for realtime in (False, True):
+        stop, procs = startLoad(args.load)
+        try:
+            result = mp.Queue()
+            worker = mp.Process(target=realtimeWorker,
+                                args=(realtime, args.rate, args.seconds, args.cpus, result))
+            worker.start()
+            lateness = result.get()
+            worker.join()
+        finally:
+            stopLoad(stop, procs)
+        printLatencyRow("realtime" if realtime else "normal", lateness)
+
+
+# -------- SERIAL READER --------
+
+def sampleWriter(master, rate, seconds):
+    # Writes "<int>\r\n" lines at `rate` Hz, batching whatever is due every millisecond
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        due = int(elapsed * rate)
+        if due > sent:
+            chunk = b"".join(b"%d\r\n" % ((i & 0xFFFF) - 32767) for i in range(sent, due))
+            os.write(master, chunk)
+            sent = due
+        time.sleep(0.001)
+
+def readWithReadline(ser, seconds):
+    count = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        line = ser.readline().decode("utf-8", errors="ignore").strip()
+        if not line:
+            continue
+        try:
+            value = int(line)
+            count += 1
+        except ValueError:
+            pass
+    return count, None
+
+def readWithFrameReader(ser, seconds):
+    from wheelserial import FrameReader
+    reader = FrameReader(ser)
+    count = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        n = reader.poll(0.1)
+        if n:
+            value = reader.latest()
+            count += n
+    return count, reader.reads
+
+def benchReader(args):
+    import serial
+
+    print(f"Serial reader over a pty, {args.seconds}s per run")
+    for rate in args.rates:
+        for label, readFn in (("readline", readWithReadline), ("FrameReader", readWithFrameReader)):
+            master, slave, path = openPty()
+            writer = mp.Process(target=sampleWriter, args=(master, rate, args.seconds + 0.5), daemon=True)
+            try:
+                with serial.Serial(path, 115200, timeout=0.1) as ser:
+                    writer.start()
+                    cpu = time.process_time()
+                    count, reads = readFn(ser, args.seconds)
+                    cpu = time.process_time() - cpu
+            finally:
+                writer.terminate()
+                writer.join()
+                os.close(master)
+                os.close(slave)
+            perSample = cpu / count * 1e6 if count else 0.0
+            extra = f" samples/read={count / reads:6.1f}" if reads else ""
+            print(f"{rate:>6} Hz {label:<12} samples={count:<8} "
+                  f"cpu={cpu / args.seconds * 100:5.1f}% {perSample:6.2f}us/sample{extra}")
+
+
+# -------- DAEMON --------
+
+def separateDriver(path, seconds, result):
+    # One single-device driver loop per process, as before the daemon
+    import serial
+    from wheeldaemon import NullOutput
+    from wheelserial import FrameReader
+
+    output = NullOutput()
+    with serial.Serial(path, 115200, timeout=0.1) as ser:
+        reader = FrameReader(ser)
+        cpu = time.process_time()
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            if reader.poll(0.5):
+                output.emit(reader.latest())
+        result.put(time.process_time() - cpu)
+
+def benchDaemon(args):
+    import serial
+    from wheeldaemon import WheelDaemon, NullOutput
+    from wheeldiscovery import Wheel
+
+    print(f"Driver CPU for N simulated devices at {args.rate} Hz each, {args.seconds}s per run")
+    for count in args.devices:
+        for label in ("separate", "daemon"):
+            ptys = [openPty() for _ in range(count)]
+            writers = [mp.Process(target=sampleWriter, args=(master, args.rate, args.seconds + 1.0), daemon=True)
+                       for master, slave, path in ptys]
+            try:
+                if label == "daemon":
+                    daemon = WheelDaemon(outputFactory=NullOutput, controlPath=None, baud="off")
+                    for i, (master, slave, path) in enumerate(ptys):
+                        ser = serial.Serial(path, 115200, timeout=0.1)
+                        daemon.addWheel(Wheel(path, f"SIM{i}", ser), paired=True)
+                    for w in writers:
+                        w.start()
+                    cpu = time.process_time()
+                    daemon.run(args.seconds)
+                    cpu = time.process_time() - cpu
+                else:
+                    result = mp.Queue()
+                    drivers = [mp.Process(target=separateDriver, args=(path, args.seconds, result))
+                               for master, slave, path in ptys]
+                    for p in drivers:
+                        p.start()
+                    for w in writers:
+                        w.start()
+                    cpu = sum(result.get() for _ in drivers)
+                    for p in drivers:
+                        p.join()
+            finally:
+                for w in writers:
+                    w.terminate()
+                    w.join()
+                for master, slave, path in ptys:
+                    os.close(master)
+                    os.close(slave)
+            print(f"{count:>3} devices {label:<9} cpu={cpu / args.seconds * 100:6.1f}% "
+                  f"per device={cpu / args.seconds * 100 / count:5.2f}%")
+
+
+# -------- SOAK --------
+
+def currentRss():
+    # Resident set size in bytes
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def soakSimulator(args, startTime, pathQueue, stop):
+    from wheelsim import fromArgs
+    sim = fromArgs(args, startTime=startTime)
+    pathQueue.put(sim.path)
+    try:
+        sim.run(stop=stop)
+    finally:
+        sim.close()
+
+def benchSoak(args):
+    # Host pipeline against the simulator for hours. The simulator sends its
+    # sequence number as the value ("ramp"), so every emitted sample can be
+    # matched to the time it was due and latency drift becomes visible.
+    from wheeldiscovery import probePort
+    from wheelserial import FrameReader
+    from wheeldaemon import NullOutput
+
+    args.waveform = "ramp"
+    startTime = mp.Value("d", 0.0)
+    pathQueue = mp.Queue()
+    stop = mp.Event()
+    sim = mp.Process(target=soakSimulator, args=(args, startTime, pathQueue, stop), daemon=True)
+    sim.start()
+    try:
+        wheel = probePort(pathQueue.get(timeout=10))
+        if not wheel:
+            print("Simulator did not pair")
+            return
+        ser = wheel.ser
+        ser.write(b"PAIRING_OK\r\n")
+        reader = FrameReader(ser)
+        output = NullOutput()
+
+        total = args.hours * 3600.0
+        started = time.monotonic()
+        nextReport = started + args.report
+        base, lastIndex = 0, -1
+        samples = lost = 0
+        expected = 0
+        latencies = []
+        firstRss = firstP50 = None
+        print(f"{'elapsed':>9} {'samples':>10} {'lost':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+              f"{'drift ms':>9} {'rss MB':>8} {'growth MB':>10}")
+        while time.monotonic() - started < total:
+            count = reader.poll(0.5)
+            now = time.monotonic()
+            for message in reader.messages:
+                if message.startswith(b"PAIRING_REQUEST:"):
+                    # Simulated reboot: pair again, the sequence starts over
+                    ser.write(b"PAIRING_OK\r\n")
+                    base, lastIndex, expected = 0, -1, 0
+            if count:
+                samples += count
+                raw = reader.latest()
+                output.emit(raw)
+                index = raw + 32767
+                wrapped = base + 65535 if index < lastIndex - 32767 else base
+                seq = wrapped + index
+                # A corrupted value lands far away from where the sequence is
+                if expected - 1 <= seq <= expected + count + args.rate * 5:
+                    base, lastIndex = wrapped, index
+                    lost += max(0, seq + 1 - expected - count)
+                    expected = seq + 1
+                    if startTime.value:
+                        latencies.append((now - (startTime.value + seq / args.rate)) * 1000.0)
+
+            if now >= nextReport:
+                nextReport += args.report
+                latencies.sort()
+                p50 = percentile(latencies, 50)
+                rss = currentRss() / 1e6
+                if firstRss is None:
+                    firstRss, firstP50 = rss, p50
+                print(f"{now - started:8.0f}s {samples:>10} {lost:>7} {p50:8.2f} "
+                      f"{percentile(latencies, 99):8.2f} {latencies[-1] if latencies else 0:8.2f} "
+                      f"{p50 - firstP50:9.2f} {rss:8.1f} {rss - firstRss:10.2f}")
+                sys.stdout.flush()
+                latencies = []
+    finally:
+        stop.set()
+        sim.join(timeout=2)
+        if sim.is_alive():
+            sim.terminate()
+
+
+# -------- SHARED STATE --------
+
+def shmReader(path, seconds, result):
+    from wheelshm import StateReader
+    reader = StateReader(path)
+    reads = torn = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        for _ in range(1000):
+            state = reader.read()
+            if state:
+                reads += 1
+                # The writer always publishes value == -raw
+                if state.value != -state.raw:
+                    torn += 1
+    result.put((reads, torn, reader.retries))
+
+def benchShm(args):
+    import tempfile
+    from wheelshm import StatePublisher
+
+    path = os.path.join(tempfile.gettempdir(), f"wheelbench-{os.getpid()}.state")
+    print(f"Seqlock state file with a {args.rate} Hz writer, {args.seconds}s per run")
+    try:
+        for count in args.readers:
+            publisher = StatePublisher(path)
+            publisher.publish(0, 0)
+            result = mp.Queue()
+            readers = [mp.Process(target=shmReader, args=(path, args.seconds, result)) for _ in range(count)]
+            for p in readers:
+                p.start()
+
+            period = 1.0 / args.rate
+            costs = []
+            nextWrite = time.perf_counter()
+            end = nextWrite + args.seconds
+            i = 0
+            while True:
+                now = time.perf_counter()
+                if now >= end:
+                    break
+                if now < nextWrite:
+                    time.sleep(min(nextWrite - now, 0.001))
+                    continue
+                i += 1
+                raw = i & 0x7FFF
+                start = time.perf_counter_ns()
+                publisher.publish(raw, -raw)
+                costs.append((time.perf_counter_ns() - start) / 1000.0)
+                nextWrite += period
+
+            stats = [result.get() for _ in readers]
+            for p in readers:
+                p.join()
+            publisher.close()
+            reads = sum(r for r, t, x in stats)
+            torn = sum(t for r, t, x in stats)
+            retries = sum(x for r, t, x in stats)
+            costs.sort()
+            print(f"{count:>3} readers  publish p50={percentile(costs, 50):5.2f}us p99={percentile(costs, 99):6.2f}us  "
+                  f"reads/s per reader={reads / args.seconds / max(count, 1):>10.0f}  retries={retries} torn={torn}")
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# -------- FILTER --------
+
+def captureSamples(args):
+    # Records raw samples from a wheel (or wheelsim.py) as "<seconds> <raw>" lines
+    from wheeldiscovery import probePort
+    from wheelserial import FrameReader
+
+    wheel = probePort(args.port)
+    if not wheel:
+        print(f"No pairing request on {args.port}")
+        return
+    with wheel.ser as ser, open(args.out, "w") as out:
+        ser.write(b"PAIRING_OK\r\n")
+        reader = FrameReader(ser)
+        started = time.monotonic()
+        total = 0
+        while time.monotonic() - started < args.seconds:
+            count = reader.poll(0.5)
+            now = time.monotonic() - started
+            for i in range(count):
+                out.write(f"{now:.6f} {reader.samples[i]}\n")
+            total += count
+    print(f"{total} samples ({total / args.seconds:.0f}/s) written to {args.out}")
+
+def loadCapture(path):
+    # "<seconds> <raw>" per line, or just "<raw>" (then --rate gives the timing)
+    times, values = [], []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            try:
+                if len(parts) == 2:
+                    times.append(float(parts[0]))
+                    values.append(int(parts[1]))
+                elif len(parts) == 1:
+                    values.append(int(parts[0]))
+            except ValueError:
+                continue
+    return (times if len(times) == len(values) else None), values
+
+def syntheticCapture(rate, seconds, noise, seed=1):
+    # Rest, slow turns, rest, fast flicks: the cases a filter trades off
+    import math
+    import random
+    rnd = random.Random(seed)
+    values = []
+    for i in range(int(rate * seconds)):
+        t = i / rate
+        phase = t % 8.0
+        if phase < 2.0:
+            v = 1500.0
+        elif phase < 4.0:
+            v = 1500.0 + 12000.0 * math.sin(math.pi * (phase - 2.0) / 2.0)
+        elif phase < 6.0:
+            v = 1500.0
+        else:
+            v = 1500.0 + 25000.0 * math.sin(4 * math.pi * (phase - 6.0))
+        values.append(int(round(v + rnd.gauss(0, noise))))
+    return values
+
+def referenceSignal(values, half):
+    # Centered moving average: looks ahead, so it has no lag and serves as "truth"
+    prefix = [0]
+    for v in values:
+        prefix.append(prefix[-1] + v)
+    n = len(values)
+    ref = []
+    for i in range(n):
+        lo = max(0, i - half)
+        hi = min(n, i + half + 1)
+        ref.append((prefix[hi] - prefix[lo]) / (hi - lo))
+    return ref
+
+def filterMetrics(outputs, ref, still, rate):
+    restErr = motionErr = 0.0
+    restN = motionN = changes = 0
+    for i in range(1, len(outputs)):
+        err = outputs[i] - ref[i]
+        if still[i]:
+            restErr += err * err
+            restN += 1
+            if outputs[i] != outputs[i - 1]:
+                changes += 1
+        else:
+            motionErr += err * err
+            motionN += 1
+    return {
+        "restRms": (restErr / restN) ** 0.5 if restN else 0.0,
+        "restChanges": changes / (restN / rate) if restN else 0.0,
+        "motionRms": (motionErr / motionN) ** 0.5 if motionN else 0.0,
+    }
+
+def benchFilter(args):
+    # Compares no filter, the fixed EMA of wheel_hid.py and NoiseFilter on
+    # recorded captures (or a synthetic one). Errors are measured against a
+    # centered moving average, which has no lag; the deadzone is left out so
+    # all filters are compared on the same scale.
+    from wheelfilter import NoiseFilter
+
+    captures = []
+    for path in args.captures:
+        times, values = loadCapture(path)
+        rate = (len(times) - 1) / (times[-1] - times[0]) if times and times[-1] > times[0] else args.rate
+        captures.append((path, rate, values))
+    if not captures:
+        captures.append((f"synthetic (noise {args.noise:g})", args.rate,
+                         syntheticCapture(args.rate, args.seconds, args.noise)))
+
+    for name, rate, values in captures:
+        if len(values) < 100:
+            print(f"{name}: too few samples")
+            continue
+        half = max(1, int(rate * 0.005))
+        ref = referenceSignal(values, half)
+        residual = sorted(abs(v - r) for v, r in zip(values, ref))
+        sigma = residual[len(residual) // 2] * 1.4826
+        # Still where the reference moved less than one noise sigma over the window
+        still = [abs(ref[min(i + half, len(ref) - 1)] - ref[max(i - half, 0)]) < sigma
+                 for i in range(len(ref))]
+
+        adaptive = NoiseFilter(deadzone=0)
+        ema = [0.0]
+
+        def emaStep(x, last=ema):
+            last[0] = last[0] * 0.2 + x * 0.8
+            return int(last[0])
+
+        print(f"{name}: {len(values)} samples at {rate:.0f} Hz, noise ~{sigma:.1f}, "
+              f"{sum(still) * 100 / len(still):.0f}% still")
+        for label, step in (("none", int), ("EMA 0.2", emaStep), ("NoiseFilter", adaptive.update)):
+            started = time.perf_counter()
+            outputs = [step(v) for v in values]
+            cost = (time.perf_counter() - started) / len(values) * 1e6
+            m = filterMetrics(outputs, ref, still, rate)
+            print(f"  {label:<12} rest rms={m['restRms']:7.2f} changes/s={m['restChanges']:7.1f} "
+                  f"motion rms={m['motionRms']:8.2f} {cost:5.2f}us/sample")
+        print(f"  learned: {adaptive.status()}")
+
+
+# -------- SPLIT MODE --------
+
+def stampWriter(master, rate, seconds):
+    # Like sampleWriter, but every value is the send time in microseconds (31 bits)
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        due = int(elapsed * rate)
+        if due > sent:
+            stamp = (time.monotonic_ns() // 1000) & 0x7FFFFFFF
+            os.write(master, b"%d\r\n" % stamp * (due - sent))
+            sent = due
+        time.sleep(0.001)
+
+def gilHog(stop):
+    # Pure-Python busy work standing in for debug prints and metrics threads
+    x = 0
+    while not stop.is_set():
+        for i in range(1000):
+            x = (x * 31 + i) & 0xFFFF
+
+def splitConsumer(split, path, seconds, hogs, result):
+    import threading
+    import serial
+    from wheelserial import FrameReader
+    from wheelfilter import NoiseFilter
+    from wheeldaemon import NullOutput
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=gilHog, args=(stop,), daemon=True) for _ in range(hogs)]
+    with serial.Serial(path, 115200, timeout=0.1) as ser:
+        if split:
+            from wheelsplit import SplitReader
+            reader = SplitReader(ser)
+        else:
+            reader = FrameReader(ser)
+        noiseFilter = NoiseFilter()
+        output = NullOutput()
+        for t in threads:
+            t.start()
+        latencies = []
+        samples = 0
+        end = time.monotonic() + seconds
+        try:
+            while time.monotonic() < end:
+                count = reader.poll(0.1)
+                if not count:
+                    continue
+                samples += count
+                output.emit(noiseFilter.updateMany(reader.samples, count))
+                now = (time.monotonic_ns() // 1000) & 0x7FFFFFFF
+                latencies.append(float((now - reader.latest()) & 0x7FFFFFFF))
+        finally:
+            stop.set()
+            dropped = reader.dropped if split else 0
+            if split:
+                reader.close()
+    result.put((samples, dropped, latencies))
+
+def benchSplit(args):
+    # Single process vs. split acquisition, with GIL-hungry threads in the driver process
+    print(f"{args.rate} Hz over a pty, {args.seconds}s per run, latency = write → emit")
+    for hogs in args.hogs:
+        for label, split in (("single", False), ("split", True)):
+            master, slave, path = openPty()
+            writer = mp.Process(target=stampWriter, args=(master, args.rate, args.seconds + 1.0), daemon=True)
+            result = mp.Queue()
+            consumer = mp.Process(target=splitConsumer, args=(split, path, args.seconds, hogs, result))
+            try:
+                consumer.start()
+                time.sleep(0.3)
+                writer.start()
+                samples, dropped, latencies = result.get(timeout=args.seconds + 10)
+                consumer.join()
+            finally:
+                writer.terminate()
+                writer.join()
+                os.close(master)
+                os.close(slave)
+            printLatencyRow(f"{label} hogs={hogs}", latencies)
+            print(f"{'':<22} {samples / args.seconds:8.0f} samples/s, {dropped} dropped in the ring")
+
+
+# ----------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Wheel driver benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    rt = sub.add_parser("realtime", help="Tail latency with and without --realtime under CPU load")
+    rt.add_argument("--rate", type=int, default=1000, help="Loop rate in Hz")
+    rt.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    rt.add_argument("--load", type=int, default=os.cpu_count() or 1, help="Number of busy processes")
+    rt.add_argument("--cpus", help="CPUs to pin the realtime run to, e.g. 2,3")
+    rt.set_defaults(func=benchRealtime)
+
+    rd = sub.add_parser("reader", help="readline() vs FrameReader CPU cost per sample over a pty")
+    rd.add_argument("--rates", type=lambda t: [int(r) for r in t.split(",")], default=[1000, 10000],
+                    help="Comma separated sample rates in Hz")
+    rd.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    rd.set_defaults(func=benchReader)
+
+    dm = sub.add_parser("daemon", help="CPU of one daemon vs one process per device, on ptys")
+    dm.add_argument("--devices", type=lambda t: [int(n) for n in t.split(",")], default=[1, 2, 4, 8],
+                    help="Comma separated device counts")
+    dm.add_argument("--rate", type=int, default=1000, help="Sample rate per device in Hz")
+    dm.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    dm.set_defaults(func=benchDaemon)
+
+    sh = sub.add_parser("shm", help="Seqlock shared state: writer cost and reader throughput")
+    sh.add_argument("--readers", type=lambda t: [int(n) for n in t.split(",")], default=[1, 4, 16],
+                    help="Comma separated reader process counts")
+    sh.add_argument("--rate", type=int, default=1000, help="Publish rate in Hz")
+    sh.add_argument("--seconds", type=float, default=3.0, help="Duration of each run")
+    sh.set_defaults(func=benchShm)
+
+    from wheelsim import buildParser
+    sk = sub.add_parser("soak", parents=[buildParser()], add_help=False, conflict_handler="resolve",
+                        help="Run the host against the simulator for hours, report memory and latency drift")
+    sk.add_argument("--hours", type=float, default=1.0, help="Duration of the soak run")
+    sk.add_argument("--report", type=float, default=60.0, help="Seconds between report lines")
+    sk.set_defaults(func=benchSoak, rate=1000.0)
+
+    sp = sub.add_parser("split", help="Single process vs. --split: throughput and latency under GIL contention")
+    sp.add_argument("--rate", type=int, default=2000, help="Sample rate in Hz")
+    sp.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    sp.add_argument("--hogs", type=lambda t: [int(n) for n in t.split(",")], default=[0, 2],
+                    help="Comma separated counts of busy Python threads in the driver process")
+    sp.set_defaults(func=benchSplit)
+
+    cp = sub.add_parser("capture", help="Record raw samples from a wheel for the filter bench")
+    cp.add_argument("--port", required=True, help="Serial port of the wheel or simulator")
+    cp.add_argument("--seconds", type=float, default=30.0, help="Recording length")
+    cp.add_argument("--out", default="capture.txt", help="Output file")
+    cp.set_defaults(func=captureSamples)
+
+    fl = sub.add_parser("filter", help="Jitter at rest and error in motion for each filter on captures")
+    fl.add_argument("captures", nargs="*", help="Files from the capture bench (synthetic data if none)")
+    fl.add_argument("--rate", type=float, default=1000.0, help="Sample rate for captures without timestamps")
+    fl.add_argument("--noise", type=float, default=20.0, help="Noise sigma of the synthetic capture")
+    fl.add_argument("--seconds", type=float, default=32.0, help="Length of the synthetic capture")
+    fl.set_defaults(func=benchFilter)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
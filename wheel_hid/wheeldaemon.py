@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+
+# Serves several wheels / pedal boxes from one process.
+# Started with `wheeldriver.py --daemon`; this file doubles as the control client:
+#   python3 wheeldaemon.py status
+#   python3 wheeldaemon.py reset FSMINEWHEEL123
+#   python3 wheeldaemon.py quit
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import selectors
+from concurrent.futures import ThreadPoolExecutor
+
+from wheelserial import FrameReader
+from wheelfilter import NoiseFilter
+from wheelshm import StatePublisher, devicePath
+from wheellink import BAUD_RATES, DEFAULT_BAUD, LinkMonitor, negotiateBaud, fallbackBaud, sendCommand
+
+# -------- DAEMON DEFAULTS --------
+CONTROL_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), "wheeldriver.sock")
+RESCAN_INTERVAL = 10.0        # Seconds between searches for newly plugged wheels
+SELECT_TIMEOUT = 0.5
+
+
+class UinputOutput:
+    def __init__(self, name):
+        import uinput
+        self.uinput = uinput
+        self.device = uinput.Device([
+            uinput.ABS_Y + (-32768, 32767, 0, 0)
+        ], name=f"WheelDriver {name}")
+
+    def emit(self, value):
+        self.device.emit(self.uinput.ABS_Y, value, syn=True)
+
+    def close(self):
+        self.device.destroy()
+
+
+class NullOutput:
+    # Output sink for benchmarks and dry runs
+
+    def __init__(self, name=None):
+        self.last = None
+
+    def emit(self, value):
+        self.last = value
+
+    def close(self):
+        pass
+
+
+class DevicePipeline:
+    # serial → FrameReader → offset/clamp → output, for one wheel
+
+    def __init__(self, wheel, output, offset=0, filtered=False, state=None):
+        self.wheel = wheel
+        self.ser = wheel.ser
+        self.output = output
+        self.state = state
+        self.offset = wheel.profile.get("offset", offset)
+        self.filter = NoiseFilter() if wheel.profile.get("filter", filtered) else None
+        self.reader = FrameReader(wheel.ser)
+        self.monitor = LinkMonitor()
+        self.samples = 0
+        self.emitted = 0
+        self.errors = 0
+        self.value = None
+        self.lastSample = 0.0
+        # Set when the link needs a slower rate; the daemon runs fallback()
+        # off the selector loop since it blocks for up to a few seconds
+        self.needsFallback = False
+        self.recovering = False
+
+    def fileno(self):
+        return self.reader.fd
+
+    def onReadable(self, now):
+        reader = self.reader
+        reader.messages.clear()
+        reader.readChunk(None)
+
+        # Only the newest sample is emitted; keep scanning if more than
+        # MAX_SAMPLES were waiting
+        latest = None
+        count = reader.scan()
+        while count:
+            self.samples += count
+            raw = reader.samples[count - 1]
+            if self.filter:
+                latest = self.filter.updateMany(reader.samples, count, self.offset)
+            else:
+                latest = raw + self.offset
+            if count < reader.maxSamples:
+                break
+            count = reader.scan()
+
+        if latest is not None:
+            value = latest
+            if value < -32767:
+                value = -32767
+            elif value > 32767:
+                value = 32767
+            self.output.emit(value)
+            if self.state:
+                self.state.publish(raw, value)
+            self.value = value
+            self.emitted += 1
+            self.lastSample = now
+
+        for message in reader.messages:
+            if message.startswith(b"ERROR:"):
+                self.errors += 1
+
+        if self.ser.baudrate > DEFAULT_BAUD:
+            if self.monitor.update(reader.samples, reader.count, reader.messages):
+                print(f"{self.wheel.name}: link error rate {self.monitor.lastRate * 100:.2f}%, falling back")
+                self.needsFallback = True
+
+    def fallback(self):
+        # Runs in the daemon's thread pool while the fd is not selected
+        fallbackBaud(self.ser)
+        self.reader.reset()
+        return self.ser.baudrate
+
+    def status(self, now):
+        return {
+            "name": self.wheel.name,
+            "code": self.wheel.code,
+            "port": self.wheel.port,
+            "baud": self.ser.baudrate,
+            "samples": self.samples,
+            "emitted": self.emitted,
+            "errors": self.errors,
+            "value": self.value,
+            "idle": round(now - self.lastSample, 3) if self.lastSample else None,
+            "recovering": self.recovering,
+            "state": self.state.path if self.state else None,
+            "filter": self.filter.status() if self.filter else None,
+        }
+
+    def close(self):
+        self.output.close()
+        if self.state:
+            self.state.close()
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+
+
+class WheelDaemon:
+    # One selector loop for every device plus the control socket.
+    # Discovery, pairing and baud fallbacks run in a small thread pool so a
+    # slow or unplugged device never stalls the others.
+
+    def __init__(self, outputFactory=UinputOutput, controlPath=CONTROL_SOCKET,
+                 baud="auto", offset=0, discoverFn=None, rescan=RESCAN_INTERVAL, hotgc=None, filtered=False,
+                 statePath=None):
+        self.outputFactory = outputFactory
+        # Base path for --shm; each wheel publishes to devicePath(statePath, code)
+        self.statePath = statePath
+        self.controlPath = controlPath
+        self.baud = baud
+        self.offset = offset
+        self.filtered = filtered
+        self.discoverFn = discoverFn
+        self.rescan = rescan
+        self.hotgc = hotgc
+        self.selector = selectors.DefaultSelector()
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        self.pipelines = {}
+        self.pending = None
+        self.recovering = {}
+        self.nextScan = 0.0
+        self.running = False
+        self.started = time.monotonic()
+        self.control = None
+
+    # ---- devices ----
+
+    def pairWheel(self, wheel):
+        wheel.ser.write(b"PAIRING_OK\r\n")
+        if self.baud != "off":
+            rates = BAUD_RATES if self.baud == "auto" else (int(self.baud),)
+            negotiateBaud(wheel.ser, rates)
+        return wheel
+
+    def addWheel(self, wheel, paired=False):
+        if not paired:
+            self.pairWheel(wheel)
+        state = StatePublisher(devicePath(self.statePath, wheel.code)) if self.statePath else None
+        pipeline = DevicePipeline(wheel, self.outputFactory(wheel.name), self.offset, self.filtered, state)
+        self.pipelines[wheel.port] = pipeline
+        self.selector.register(pipeline.fileno(), selectors.EVENT_READ, pipeline)
+        print(f"Serving {wheel.name} ({wheel.code}) on {wheel.port}")
+        return pipeline
+
+    def removeWheel(self, pipeline, reason=""):
+        try:
+            self.selector.unregister(pipeline.fileno())
+        except (KeyError, ValueError):
+            pass
+        pipeline.close()
+        self.pipelines.pop(pipeline.wheel.port, None)
+        print(f"Dropped {pipeline.wheel.name} on {pipeline.wheel.port} {reason}".rstrip())
+
+    def startFallback(self, pipeline):
+        # The pipeline leaves the selector until its link is back
+        self.selector.unregister(pipeline.fileno())
+        pipeline.needsFallback = False
+        pipeline.recovering = True
+        self.recovering[pipeline.wheel.port] = (pipeline, self.pool.submit(pipeline.fallback))
+
+    def finishFallbacks(self):
+        for port, (pipeline, future) in list(self.recovering.items()):
+            if not future.done():
+                continue
+            del self.recovering[port]
+            pipeline.recovering = False
+            if self.pipelines.get(port) is not pipeline:
+                continue    # Reset or dropped meanwhile
+            try:
+                rate = future.result()
+            except Exception as e:
+                self.removeWheel(pipeline, f"({e})")
+                continue
+            print(f"{pipeline.wheel.name}: link at {rate} baud")
+            self.selector.register(pipeline.fileno(), selectors.EVENT_READ, pipeline)
+
+    def startScan(self, now):
+        # Looks for wheels on ports that are not served yet, in the background
+        if not self.discoverFn or self.pending or now < self.nextScan:
+            return
+        busy = set(self.pipelines)
+        self.pending = self.pool.submit(
+            lambda: [self.pairWheel(w) for w in self.discoverFn(busy)])
+        self.nextScan = now + self.rescan
+
+    def finishScan(self):
+        if not self.pending or not self.pending.done():
+            return
+        try:
+            wheels = self.pending.result()
+        except Exception as e:
+            print(f"Discovery failed: {e}")
+            wheels = []
+        self.pending = None
+        for wheel in wheels:
+            if wheel.port in self.pipelines:
+                wheel.ser.close()
+            else:
+                self.addWheel(wheel, paired=True)
+
+    # ---- control socket ----
+
+    def openControl(self):
+        if not self.controlPath:
+            return
+        if os.path.exists(self.controlPath):
+            os.unlink(self.controlPath)
+        self.control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.control.bind(self.controlPath)
+        self.control.listen(4)
+        self.control.setblocking(False)
+        self.selector.register(self.control, selectors.EVENT_READ, None)
+
+    def closeControl(self):
+        if not self.control:
+            return
+        self.selector.unregister(self.control)
+        self.control.close()
+        self.control = None
+        if os.path.exists(self.controlPath):
+            os.unlink(self.controlPath)
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            "uptime": round(now - self.started, 1),
+            "cpu": round(time.process_time(), 3),
+            "devices": [p.status(now) for p in self.pipelines.values()],
+        }
+
+    def handleCommand(self, line):
+        parts = line.split()
+        if not parts:
+            return {"error": "empty command"}
+        command, names = parts[0].lower(), parts[1:]
+        if command == "status":
+            return self.status()
+        if command == "reset":
+            done = []
+            for pipeline in list(self.pipelines.values()):
+                if names and pipeline.wheel.code not in names and pipeline.wheel.name not in names:
+                    continue
+                # The wheel sends a new pairing request, the rescan picks it up again
+                sendCommand(pipeline.ser, "RESET_PAIRING")
+                self.removeWheel(pipeline, "(reset)")
+                done.append(pipeline.wheel.name)
+            self.nextScan = 0.0
+            return {"reset": done}
+        if command == "quit":
+            self.running = False
+            return {"quit": True}
+        return {"error": f"unknown command {command!r}"}
+
+    def serveControl(self):
+        # Commands are short, so each client is answered in one go
+        try:
+            conn, _ = self.control.accept()
+        except BlockingIOError:
+            return
+        with conn:
+            conn.settimeout(0.2)
+            try:
+                line = conn.recv(1024).decode("utf-8", errors="ignore").strip()
+                reply = self.handleCommand(line)
+                conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            except OSError:
+                pass
+
+    # ---- loop ----
+
+    def run(self, seconds=None):
+        self.running = True
+        self.openControl()
+        end = time.monotonic() + seconds if seconds else None
+        try:
+            while self.running:
+                now = time.monotonic()
+                if end and now >= end:
+                    break
+                self.startScan(now)
+                self.finishScan()
+                self.finishFallbacks()
+                events = self.selector.select(SELECT_TIMEOUT)
+                now = time.monotonic()
+                for key, _ in events:
+                    pipeline = key.data
+                    if pipeline is None:
+                        self.serveControl()
+                        continue
+                    try:
+                        pipeline.onReadable(now)
+                    except OSError as e:
+                        self.removeWheel(pipeline, f"({e})")
+                        continue
+                    if pipeline.needsFallback:
+                        self.startFallback(pipeline)
+                if self.hotgc:
+                    self.hotgc.tick()
+        finally:
+            self.closeControl()
+            for pipeline in list(self.pipelines.values()):
+                self.removeWheel(pipeline)
+            self.pool.shutdown(wait=False)
+
+
+def sendControl(command, path=CONTROL_SOCKET, timeout=2.0):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(path)
+        conn.sendall(command.encode("utf-8") + b"\n")
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return json.loads(reply.decode("utf-8"))
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Control a running wheeldriver.py --daemon")
+    arguments.add_argument("command", nargs="+", help="status | reset [code|name ...] | quit")
+    arguments.add_argument("--socket", default=CONTROL_SOCKET, help="Control socket path")
+    args = arguments.parse_args()
+
+    try:
+        print(json.dumps(sendControl(" ".join(args.command), args.socket), indent=2))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+from serial.tools import list_ports
+
+from wheellink import DEFAULT_BAUD, sendCommand, waitForLine
+
+# -------- DISCOVERY DEFAULTS --------
+PAIRING_PREFIX = "PAIRING_REQUEST:"
+BOOT_LINE = "BOOT_OK"
+DISCOVERY_TIMEOUT = 6.0       # Per port, all ports are probed at the same time
+# Pulse DTR (board reset) if neither BOOT_OK nor a request arrived by then. Opening
+# the port can reset the board already: bootloader (up to ~1 s), the 300 ms settle and
+# PAIR_INTERVAL_MS (1 s) come before its first request, so this has to be longer.
+RESET_AFTER = 3.0
+PROFILES_FILE = os.path.expanduser("~/.wheeldriver/profiles.json")
+
+# USB VID/PID pairs of Arduino UNO boards and the usual USB-serial clones
+KNOWN_USB_IDS = {
+    (0x2341, 0x0043),   # Arduino UNO R3
+    (0x2341, 0x0001),   # Arduino UNO
+    (0x2341, 0x0243),   # Arduino UNO R3 (newer)
+    (0x2A03, 0x0043),   # Arduino.org UNO
+    (0x1A86, 0x7523),   # CH340
+    (0x0403, 0x6001),   # FTDI FT232
+    (0x10C4, 0xEA60),   # CP210x
+}
+
+
+class Wheel:
+    # A port that answered with a pairing request, still open and unpaired
+
+    def __init__(self, port, code, ser):
+        self.port = port
+        self.code = code
+        self.ser = ser
+        self.profile = {"name": code}
+
+    @property
+    def name(self):
+        return self.profile.get("name", self.code)
+
+    def __repr__(self):
+        return f"Wheel({self.port!r}, {self.code!r}, {self.name!r})"
+
+
+def parseUsbId(text):
+    # "2341:0043" → (0x2341, 0x0043)
+    vid, pid = str(text).split(":", 1)
+    return int(vid, 16), int(pid, 16)
+
+def candidatePorts(usbIds=KNOWN_USB_IDS):
+    return sorted(p.device for p in list_ports.comports()
+                  if p.vid is not None and (p.vid, p.pid) in usbIds)
+
+def openWheelPort(port, baud=DEFAULT_BAUD, timeout=10):
+    # DTR is cleared before opening, which keeps the board from resetting where the
+    # driver honours it (Windows). Linux raises DTR on open regardless, so there the
+    # board usually reboots and sends BOOT_OK first.
+    ser = serial.Serial(None, baud, timeout=timeout, rtscts=0, stopbits=1, bytesize=8)
+    ser.port = port
+    ser.dtr = False
+    ser.rts = False
+    ser.open()
+    return ser
+
+def waitForPairing(ser, timeout=DISCOVERY_TIMEOUT):
+    # Returns the pairing code from the next "PAIRING_REQUEST:<code>" line.
+    # An already paired board streams instead, so it is told to unpair first;
+    # if that gets no answer the board is reset through DTR. A board that is
+    # booting (BOOT_OK) is left alone, a pulse would only start it over.
+    deadline = time.monotonic() + timeout
+    sendCommand(ser, "RESET_PAIRING")
+    line = waitForLine(ser, (PAIRING_PREFIX, BOOT_LINE), min(RESET_AFTER, timeout))
+    if line == BOOT_LINE:
+        line = waitForLine(ser, PAIRING_PREFIX, max(deadline - time.monotonic(), 0))
+    elif not line:
+        try:
+            ser.dtr = True
+            time.sleep(0.05)
+            ser.dtr = False
+        except (serial.SerialException, OSError):
+            pass    # No modem lines (e.g. a pty), just keep waiting
+        line = waitForLine(ser, PAIRING_PREFIX, max(deadline - time.monotonic(), 0))
+    if not line:
+        return None
+    return line[len(PAIRING_PREFIX):]
+
+def probePort(port, timeout=DISCOVERY_TIMEOUT):
+    try:
+        ser = openWheelPort(port)
+    except (serial.SerialException, OSError) as e:
+        print(f"Discovery: cannot open {port} ({e})")
+        return None
+    try:
+        code = waitForPairing(ser, timeout)
+    except (serial.SerialException, OSError) as e:
+        print(f"Discovery: {port} failed ({e})")
+        code = None
+    if not code:
+        ser.close()
+        return None
+    return Wheel(port, code, ser)
+
+def discover(ports=None, timeout=DISCOVERY_TIMEOUT, usbIds=KNOWN_USB_IDS):
+    # Probes every candidate port concurrently, so the whole scan takes
+    # at most `timeout` seconds regardless of how many ports there are
+    if ports is None:
+        ports = candidatePorts(usbIds)
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        found = pool.map(lambda port: probePort(port, timeout), ports)
+        return [wheel for wheel in found if wheel]
+
+class Rescanner:
+    # Discovery for the daemon's periodic rescans. Every probe resets the board
+    # (RESET_PAIRING, DTR), so a port that did not answer is not probed again
+    # until it disappears from listPorts() and comes back, e.g. when replugged.
+
+    def __init__(self, listPorts, probe=discover):
+        self.listPorts = listPorts
+        self.probe = probe
+        self.failed = set()
+
+    def __call__(self, busy=()):
+        ports = self.listPorts()
+        self.failed.intersection_update(ports)
+        fresh = [p for p in ports if p not in busy and p not in self.failed]
+        wheels = self.probe(fresh) if fresh else []
+        self.failed.update(set(fresh) - {w.port for w in wheels})
+        return wheels
+
+def loadProfiles(path=PROFILES_FILE):
+    # {"FSMINEWHEEL123": {"name": "wheel", "offset": 120}, ...}
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            profiles = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read profiles from {path} ({e})")
+        return {}
+    if not isinstance(profiles, dict):
+        print(f"Ignoring {path}: expected an object keyed by pairing code")
+        return {}
+    return profiles
+
+def bindProfiles(wheels, profiles):
+    for wheel in wheels:
+        profile = profiles.get(wheel.code)
+        if isinstance(profile, dict):
+            wheel.profile = dict(profile, name=profile.get("name", wheel.code))
+    return wheels
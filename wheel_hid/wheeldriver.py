@@ -1,8 +1,18 @@
 import serial
 import time
 import sys
+import os
 import argparse
 
+from wheelaxis import valueToPercent, remakevalue
+from wheelrealtime import enableRealtime, parseCpuList, HotLoopGC, RT_PRIORITY
+from wheelserial import FrameReader
+from wheeldiscovery import KNOWN_USB_IDS, PROFILES_FILE, Rescanner, candidatePorts, discover, probePort, parseUsbId, loadProfiles, bindProfiles
+from wheeldaemon import CONTROL_SOCKET
+from wheelshm import STATE_FILE, StatePublisher
+from wheelfilter import NoiseFilter
+from wheellink import BAUD_RATES, DEFAULT_BAUD, PROBE_COUNT, LinkMonitor, negotiateBaud, fallbackBaud, probeLink, printProbe, requestStats, printStats
+
 # -------- USER OFFSET (RAW UNITS) --------
 # Positive = shift right, Negative = shift left
 USER_OFFSET = 0
@@ -23,47 +33,137 @@ def getpaircode(string):
 def printcleanoutput():
     print(cleanString(ser.readline()))
 
-def valueToPercent(value: int) -> float:
-    if value < -32767 or value > 32767:
-        raise ValueError("Value out of range (-32767 .. 32767)")
-
-    return (value / 32767.0) * 100.0
+def startRealtime(args):
+    # Opt-in realtime mode; returns a started GC guard for the hot loop or None
+    if not args.realtime:
+        return None
+    enableRealtime(priority=args.rt_priority, cpus=parseCpuList(args.rt_cpus))
+    return HotLoopGC().start()
+
+def setupLink(ser, args):
+    # Agree on a faster baud rate after pairing, optionally measure the link
+    if args.baud != "off":
+        rates = BAUD_RATES if args.baud == "auto" else (int(args.baud),)
+        negotiateBaud(ser, rates)
+    if args.probe:
+        printProbe(probeLink(ser, args.probe))
+        sys.exit(0)
+    if args.stats:
+        # Counters cover the time since pairing, so keep reading the stream first
+        reader = FrameReader(ser)
+        end = time.monotonic() + args.stats
+        while time.monotonic() < end:
+            reader.poll(0.1)
+        printStats(requestStats(ser))
+        sys.exit(0)
+
+def checkLink(ser, reader, monitor):
+    # Step down to a slower baud rate when too many lines arrive garbled
+    if ser.baudrate <= DEFAULT_BAUD:
+        return
+    if monitor.update(reader.samples, reader.count, reader.messages):
+        print(f"Link error rate {monitor.lastRate * 100:.2f}%, falling back")
+        fallbackBaud(ser)
+        reader.reset()
+
+def connectWheel(args):
+    # Opens the wheel and waits for its pairing request. Without --port every
+    # known USB serial port is probed at the same time.
+    if args.port:
+        print(f"Now using port: {args.port}")
+        wheel = probePort(str(args.port))
+        wheels = [wheel] if wheel else []
+    else:
+        usbIds = KNOWN_USB_IDS | {parseUsbId(u) for u in args.usb_id or []}
+        ports = candidatePorts(usbIds)
+        print(f"Searching for wheels on: {', '.join(ports) or 'no matching ports'}")
+        wheels = discover(ports)
+
+    bindProfiles(wheels, loadProfiles(args.profiles))
+    for wheel in wheels:
+        print(f"Found {wheel.name} ({wheel.code}) on {wheel.port}")
+
+    if args.list:
+        for wheel in wheels:
+            wheel.ser.close()
+        sys.exit(0)
+
+    chosen = [w for w in wheels if not args.code or w.code == args.code][:1]
+    for wheel in wheels:
+        if wheel not in chosen:
+            wheel.ser.close()
+    if not chosen:
+        print("No wheel answered with a pairing request")
+        sys.exit(1)
+    return chosen[0]
+
+def runDaemon(args):
+    # Serves every wheel found (or every port in --port a,b,c) from one process
+    from wheeldaemon import WheelDaemon
+
+    usbIds = KNOWN_USB_IDS | {parseUsbId(u) for u in args.usb_id or []}
+    profiles = loadProfiles(args.profiles)
 
-def remakevalue(v: int) -> int:
-    # clamp input
-    if v < -32767:
-        v = -32767
-    if v > 32767:
-        v = 32767
+    if args.port:
+        # Listed ports count as present while their device node exists
+        rescan = Rescanner(lambda: [p for p in args.port.split(",") if os.path.exists(p)])
+    else:
+        rescan = Rescanner(lambda: candidatePorts(usbIds))
 
-    # map -32767..32767 → 0..32768
-    return int((v + 32767) * 32768 / 65534)
+    def discoverNew(busy):
+        return bindProfiles(rescan(busy), profiles)
 
+    daemon = WheelDaemon(baud=args.baud, offset=USER_OFFSET, discoverFn=discoverNew, filtered=args.filter,
+                         controlPath=args.control, hotgc=startRealtime(args), statePath=args.shm)
+    print(f"Daemon running, control socket: {args.control}")
+    daemon.run()
 
 
 if __name__ == "__main__":
     arguments = argparse.ArgumentParser()
-    arguments.add_argument("--port", help="Specifies which port to use")
+    arguments.add_argument("--port", help="Specifies which port to use (default: search all Arduino-like USB ports)")
+    arguments.add_argument("--code", help="Use the wheel with this pairing code when several are found")
+    arguments.add_argument("--list", action="store_true", help="List the wheels found and exit")
+    arguments.add_argument("--usb-id", action="append", help="Extra USB VID:PID to search, e.g. 2341:0043")
+    arguments.add_argument("--profiles", default=PROFILES_FILE, help="JSON file with per-wheel settings keyed by pairing code")
+    arguments.add_argument("--daemon", action="store_true", help="Linux: serve every wheel found from one process")
+    arguments.add_argument("--control", default=CONTROL_SOCKET, help="Control socket of --daemon")
     arguments.add_argument("-d", "--debug", help="Outputs the incoming text from the arduino")
+    arguments.add_argument("--baud", default="auto", help="Baud rate to negotiate after pairing: auto, off or a rate like 1000000")
+    arguments.add_argument("--probe", type=int, nargs="?", const=PROBE_COUNT, help="Measure link throughput and error rate after pairing, then exit")
+    arguments.add_argument("--stats", type=float, nargs="?", const=2.0, help="Stream for N seconds after pairing, print the firmware's loop and TX counters, then exit")
+    arguments.add_argument("--filter", action="store_true", help="Adaptive noise filter with automatic deadzone and hysteresis (learns the noise while the wheel is still)")
+    arguments.add_argument("--ffb", action="store_true", help="Linux: advertise FF_RUMBLE/FF_CONSTANT and forward effects to the wheel's vibration motor")
+    arguments.add_argument("--shm", nargs="?", const=STATE_FILE, help=f"Publish the latest sample to a shared-memory file for other tools (default {STATE_FILE}; one file per wheel with --daemon)")
+    arguments.add_argument("--split", action="store_true", help="Linux: read and parse the serial port in a separate process, connected through a shared-memory ring")
+    arguments.add_argument("--trace", metavar="FILE", help="Linux: record every sample (raw, filtered, emitted, timing) to FILE for wheeltrace.py")
+    arguments.add_argument("--realtime", action="store_true", help="Linux: SCHED_FIFO/nice, CPU pinning, mlockall and manual GC in the hot loop")
+    arguments.add_argument("--rt-priority", type=int, default=RT_PRIORITY, help="SCHED_FIFO priority used by --realtime")
+    arguments.add_argument("--rt-cpus", help="CPUs to pin the driver to with --realtime, e.g. 2,3 or 2-3")
+    arguments.add_argument("--rt-acquire-cpus", help="CPUs to pin the --split acquisition process to with --realtime (default: the --rt-cpus set)")
     args = arguments.parse_args()
 
-    if args.port:
-        port = str(args.port)
-        print(f"Now using port: {port}")
-    else:
-        port = 'COM4'  # Default port for Windows
+    if args.daemon:
+        # Single-wheel features the daemon does not have
+        unsupported = [flag for flag, value in (("--ffb", args.ffb), ("--split", args.split), ("--trace", args.trace),
+                                                ("--probe", args.probe), ("--stats", args.stats)) if value]
+        if unsupported:
+            arguments.error(f"{', '.join(unsupported)} cannot be used with --daemon")
+        runDaemon(args)
+        sys.exit(0)
+
+    # Latest sample for overlays/loggers, see wheelshm.py
+    state = StatePublisher(args.shm) if args.shm else None
+
+    wheel = connectWheel(args)
+    ser = wheel.ser
+    offset = wheel.profile.get("offset", USER_OFFSET)
+    noiseFilter = NoiseFilter() if wheel.profile.get("filter", args.filter) else None
 
     if args.debug:
-        with serial.Serial(port, 115200, timeout=10, rtscts=0, stopbits=1, bytesize=8) as ser:
-            ser.setDTR(False)
-            ser.setRTS(False)
-            time.sleep(1)
+        with ser:
             print(ser.name)
-            print(cleanString(ser.readline()))
-            time.sleep(5)
-            code = str(ser.readline())
-            code = getpaircode(code)
-            print(f"Paircode found! {code}")
+            print(f"Paircode found! {wheel.code}")
             ser.write(b"PAIRING_OK\r\n")
             while True:
                 line = ser.readline().decode("utf-8", errors="ignore").strip()
@@ -79,20 +179,14 @@ if __name__ == "__main__":
 
 
     try:
-        with serial.Serial(port, 115200, timeout=10, rtscts=0, stopbits=1, bytesize=8) as ser:
-            ser.setDTR(False)
-            ser.setRTS(False)
+        with ser:
             print(f"Using: {sys.platform}")
             osplatform = sys.platform
-            time.sleep(1)
             print(ser.name)
-            print(cleanString(ser.readline()))
-            time.sleep(5)
-            code = str(ser.readline())
-            code = getpaircode(code)
-            print(f"Paircode found! {code}")
+            print(f"Paircode found! {wheel.code}")
             ser.write(b"PAIRING_OK\r\n")
             print("Pairing Handshake done.")
+            setupLink(ser, args)
             print("Calibration...")
             print("Turn the POT or WHEEL to absolute MAX")
             time.sleep(5)
@@ -116,16 +210,69 @@ if __name__ == "__main__":
             time.sleep(4)
             if osplatform == "linux" or osplatform == "Linux":
                 print("Starting linux virtual wheel")
-                import uinput
-                device = uinput.Device([
-                    uinput.ABS_Y + (-32768, 32767, 0, 0)
-                ], name="WheelDriver v1.0")
+                if args.ffb:
+                    # Raw uinput device that also accepts force feedback effects
+                    from wheelffb import FFDevice, FFBridge
+                    device = FFDevice(name="WheelDriver v1.0")
+                    bridge = FFBridge(device, ser)
+                    emit = device.emit
+                else:
+                    import uinput
+                    device = uinput.Device([
+                        uinput.ABS_Y + (-32768, 32767, 0, 0)
+                    ], name="WheelDriver v1.0")
+                    emit = lambda value: device.emit(uinput.ABS_Y, value, syn=True)
                 print("Virtual wheel started.")
                 time.sleep(3)
-                while True:
-                    line = ser.readline().decode("utf-8", errors="ignore").strip()
-                    value = int(line)
-                    device.emit(uinput.ABS_Y, value, syn=True)
+                monitor = LinkMonitor()
+                hotgc = startRealtime(args)
+                if args.split:
+                    # Acquisition in its own process (inherits the realtime settings),
+                    # which also takes care of the link error fallback
+                    from wheelsplit import SplitReader
+                    reader = SplitReader(ser, cpus=parseCpuList(args.rt_acquire_cpus) if args.realtime else None)
+                else:
+                    reader = FrameReader(ser)
+                # Only now: forking with threads running (--split) can leave the
+                # child stuck on a lock one of them held
+                if args.ffb:
+                    bridge.start()
+                if args.trace:
+                    from wheeltrace import TraceWriter
+                    trace = TraceWriter(args.trace)
+                    # Split mode knows when each sample was read and its acquisition number
+                    stamps = reader.stamps if args.split else None
+                    seqs = reader.seqs if args.split else None
+                else:
+                    trace = None
+                try:
+                    while True:
+                        # Several samples may arrive per read; only the newest is emitted,
+                        # but the noise filter sees all of them
+                        count = reader.poll(1.0)
+                        if count:
+                            raw = reader.latest()
+                            if trace:
+                                readAt = time.monotonic_ns()
+                                value = trace.process(reader.samples, count, offset, noiseFilter)
+                            elif noiseFilter:
+                                value = noiseFilter.updateMany(reader.samples, count, offset)
+                            else:
+                                value = min(max(raw + offset, -32767), 32767)
+                            emit(value)
+                            if trace:
+                                trace.commit(readAt, time.monotonic_ns(), stamps, seqs)
+                            if state:
+                                state.publish(raw, value)
+                        if not args.split:
+                            checkLink(ser, reader, monitor)
+                        if hotgc:
+                            hotgc.tick()
+                finally:
+                    if args.split:
+                        reader.close()
+                    if trace:
+                        trace.close()
             elif osplatform in ("win32", "Windows"):
                 print("Starting windows virtual wheel (pyvjoystick)")
                 from pyvjoystick import vjoy
@@ -139,25 +286,30 @@ if __name__ == "__main__":
 
                 print("Virtual wheel started.")
                 time.sleep(2)
+                reader = FrameReader(ser)
+                monitor = LinkMonitor()
+                hotgc = startRealtime(args)
 
                 while True:
+                    if hotgc:
+                        hotgc.tick()
                     try:
-                        raw = ser.readline()
-                        if not raw:
-                            continue
+                        reader.poll(1.0)
 
-                        line = raw.decode("utf-8", errors="ignore").strip()
+                        # Non-numeric lines are collected separately
+                        if args.debug:
+                            for message in reader.messages:
+                                print("IGNORED:", message.decode("utf-8", errors="ignore"))
 
-                        # Skip non-numeric lines
-                        if not line.lstrip("-").isdigit():
-                            if args.debug:
-                                print("IGNORED:", line)
+                        checkLink(ser, reader, monitor)
+                        if not reader.count:
                             continue
 
-                        value = int(line)
-
-                        # Apply user offset
-                        value += USER_OFFSET
+                        # Apply user offset (per wheel profile or USER_OFFSET)
+                        if noiseFilter:
+                            value = noiseFilter.updateMany(reader.samples, reader.count, offset)
+                        else:
+                            value = reader.latest() + offset
 
                         # Clamp to int16 range
                         if value < -32767:
@@ -175,6 +327,9 @@ if __name__ == "__main__":
                             wheelvalue = 0x8000
 
                         wheel.set_axis(vjoy.HID_USAGE.Y, wheelvalue)
+                        if state:
+                            # Signed axis value like on Linux, not the vJoy range
+                            state.publish(reader.latest(), value)
 
                         print(f"RAW={value}  VJOY={wheelvalue}")
 
@@ -0,0 +1,260 @@
+import os
+import time
+import fcntl
+import struct
+import select
+import threading
+
+# Force feedback for the Linux virtual wheel.
+#
+# python-uinput cannot receive effect uploads, so with --ffb the wheel is
+# created directly on /dev/uinput. Games upload FF_RUMBLE / FF_CONSTANT
+# effects and start/stop them; a background thread turns that into a
+# single vibration strength and sends it to the Arduino as a compact
+# binary command. The axis path only ever writes to the device.
+
+# -------- linux/input.h, linux/uinput.h --------
+EV_SYN = 0x00
+EV_ABS = 0x03
+EV_FF = 0x15
+EV_UINPUT = 0x0101
+SYN_REPORT = 0
+ABS_Y = 0x01
+BUS_USB = 0x03
+
+FF_RUMBLE = 0x50
+FF_CONSTANT = 0x52
+FF_GAIN = 0x60
+
+UI_FF_UPLOAD = 1
+UI_FF_ERASE = 2
+
+def _IOC(direction, nr, size):
+    return (direction << 30) | (size << 16) | (ord("U") << 8) | nr
+
+INPUT_EVENT = struct.Struct("llHHi")                 # struct input_event
+UINPUT_SETUP = struct.Struct("HHHH80sI")             # struct uinput_setup
+UINPUT_ABS_SETUP = struct.Struct("Hxxiiiiii")        # struct uinput_abs_setup
+FF_EFFECT_SIZE = 48                                  # struct ff_effect (64-bit layout)
+FF_EFFECT_HEADER = struct.Struct("HhHHHHH")          # type, id, direction, trigger, replay
+FF_UPLOAD = struct.Struct("Ii")                      # request_id, retval (+ effect, old)
+FF_UPLOAD_SIZE = 8 + 2 * FF_EFFECT_SIZE
+FF_ERASE = struct.Struct("IiI")                      # request_id, retval, effect_id
+
+UI_DEV_CREATE = _IOC(0, 1, 0)
+UI_DEV_DESTROY = _IOC(0, 2, 0)
+UI_DEV_SETUP = _IOC(1, 3, UINPUT_SETUP.size)
+UI_ABS_SETUP = _IOC(1, 4, UINPUT_ABS_SETUP.size)
+UI_SET_EVBIT = _IOC(1, 100, 4)
+UI_SET_ABSBIT = _IOC(1, 103, 4)
+UI_SET_FFBIT = _IOC(1, 107, 4)
+UI_BEGIN_FF_UPLOAD = _IOC(3, 200, FF_UPLOAD_SIZE)
+UI_END_FF_UPLOAD = _IOC(1, 201, FF_UPLOAD_SIZE)
+UI_BEGIN_FF_ERASE = _IOC(3, 202, FF_ERASE.size)
+UI_END_FF_ERASE = _IOC(1, 203, FF_ERASE.size)
+
+# -------- Wire format to the Arduino --------
+# [FF_SYNC, command, strength, duration_hi, duration_lo, xor(command..duration_lo)]
+# duration is in ms, 0 = until stopped. FF_SYNC never appears in the
+# ASCII commands, so handleSerial() can tell the two apart byte by byte.
+FF_SYNC = 0xF5
+FF_PLAY = ord("P")
+FF_STOP = ord("S")
+FF_DURATION_MAX = 0xFFFF      # ms, longer effects are sent again before they run out
+FF_RESEND_EARLY = 500         # ms before the wheel would stop a clamped effect
+FF_EFFECTS_MAX = 16
+
+
+def encodeCommand(command, strength=0, duration=0):
+    strength = max(0, min(255, int(strength)))
+    duration = max(0, min(FF_DURATION_MAX, int(duration)))
+    body = bytes((command, strength, duration >> 8, duration & 0xFF))
+    check = 0
+    for b in body:
+        check ^= b
+    return bytes((FF_SYNC,)) + body + bytes((check,))
+
+def parseEffect(data):
+    # Returns the parts of struct ff_effect the wheel can use
+    kind, effectId, direction, button, interval, length, delay = FF_EFFECT_HEADER.unpack_from(data, 0)
+    effect = {"type": kind, "id": effectId, "length": length, "delay": delay, "strength": 0.0}
+    if kind == FF_RUMBLE:
+        strong, weak = struct.unpack_from("HH", data, 16)
+        effect["strength"] = max(strong, weak // 2) / 65535.0
+    elif kind == FF_CONSTANT:
+        level, = struct.unpack_from("h", data, 16)
+        # A vibration wheel cannot push, so only the size of the force counts
+        effect["strength"] = min(abs(level) / 32767.0, 1.0)
+    return effect
+
+
+class FFDevice:
+    # Virtual wheel on /dev/uinput with ABS_Y plus FF_RUMBLE / FF_CONSTANT
+
+    def __init__(self, name="WheelDriver v1.0", path="/dev/uinput", effectsMax=FF_EFFECTS_MAX):
+        self.fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_ABS)
+            fcntl.ioctl(self.fd, UI_SET_ABSBIT, ABS_Y)
+            fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_FF)
+            for bit in (FF_RUMBLE, FF_CONSTANT, FF_GAIN):
+                fcntl.ioctl(self.fd, UI_SET_FFBIT, bit)
+            fcntl.ioctl(self.fd, UI_ABS_SETUP, UINPUT_ABS_SETUP.pack(ABS_Y, 0, -32768, 32767, 0, 0, 0))
+            fcntl.ioctl(self.fd, UI_DEV_SETUP, UINPUT_SETUP.pack(
+                BUS_USB, 0x1d6b, 0x0104, 1, name.encode("utf-8")[:79], effectsMax))
+            fcntl.ioctl(self.fd, UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.sync = INPUT_EVENT.pack(0, 0, EV_SYN, SYN_REPORT, 0)
+
+    def fileno(self):
+        return self.fd
+
+    def emit(self, value):
+        # Axis value and SYN_REPORT in one write
+        os.write(self.fd, INPUT_EVENT.pack(0, 0, EV_ABS, ABS_Y, value) + self.sync)
+
+    def readFFEvents(self):
+        # Returns ("upload", effect) / ("erase", id) / ("play", id, count) / ("gain", value)
+        events = []
+        try:
+            data = os.read(self.fd, INPUT_EVENT.size * 64)
+        except BlockingIOError:
+            return events
+        for offset in range(0, len(data) - INPUT_EVENT.size + 1, INPUT_EVENT.size):
+            _, _, kind, code, value = INPUT_EVENT.unpack_from(data, offset)
+            if kind == EV_UINPUT and code == UI_FF_UPLOAD:
+                events.append(("upload", self.finishUpload(value)))
+            elif kind == EV_UINPUT and code == UI_FF_ERASE:
+                events.append(("erase", self.finishErase(value)))
+            elif kind == EV_FF and code == FF_GAIN:
+                events.append(("gain", value))
+            elif kind == EV_FF:
+                events.append(("play", code, value))
+        return events
+
+    def finishUpload(self, requestId):
+        buf = bytearray(FF_UPLOAD_SIZE)
+        FF_UPLOAD.pack_into(buf, 0, requestId, 0)
+        fcntl.ioctl(self.fd, UI_BEGIN_FF_UPLOAD, buf)
+        effect = parseEffect(bytes(buf[8:8 + FF_EFFECT_SIZE]))
+        FF_UPLOAD.pack_into(buf, 0, requestId, 0)
+        fcntl.ioctl(self.fd, UI_END_FF_UPLOAD, buf)
+        return effect
+
+    def finishErase(self, requestId):
+        buf = bytearray(FF_ERASE.pack(requestId, 0, 0))
+        fcntl.ioctl(self.fd, UI_BEGIN_FF_ERASE, buf)
+        _, _, effectId = FF_ERASE.unpack(buf)
+        FF_ERASE.pack_into(buf, 0, requestId, 0, effectId)
+        fcntl.ioctl(self.fd, UI_END_FF_ERASE, buf)
+        return effectId
+
+    def close(self):
+        try:
+            fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
+
+
+class EffectMixer:
+    # Uploaded effects and what is playing, reduced to one vibration strength
+
+    def __init__(self):
+        self.effects = {}
+        self.playing = {}     # id → (start, end or None)
+        self.gain = 1.0
+
+    def handle(self, event, now):
+        kind = event[0]
+        if kind == "upload":
+            effect = event[1]
+            self.effects[effect["id"]] = effect
+        elif kind == "erase":
+            self.effects.pop(event[1], None)
+            self.playing.pop(event[1], None)
+        elif kind == "gain":
+            self.gain = max(0, min(0xFFFF, event[1])) / 65535.0
+        elif kind == "play":
+            effectId, count = event[1], event[2]
+            effect = self.effects.get(effectId)
+            if not effect or count <= 0:
+                self.playing.pop(effectId, None)
+                return
+            start = now + effect["delay"] / 1000.0
+            # count repeats of length ms, 0 length = until stopped
+            end = start + count * effect["length"] / 1000.0 if effect["length"] else None
+            self.playing[effectId] = (start, end)
+
+    def output(self, now):
+        # Returns (strength 0..255, ms until it changes or 0 if open ended)
+        strength = 0.0
+        change = None
+        for effectId, (start, end) in list(self.playing.items()):
+            if end is not None and now >= end:
+                del self.playing[effectId]
+                continue
+            if now < start:
+                change = start if change is None else min(change, start)
+                continue
+            strength = max(strength, self.effects[effectId]["strength"])
+            if end is not None:
+                change = end if change is None else min(change, end)
+        level = int(round(strength * self.gain * 255))
+        remaining = int((change - now) * 1000) + 1 if change is not None else 0
+        return level, remaining
+
+
+class FFBridge(threading.Thread):
+    # Reads FF events from `source` (FFDevice or a stand-in with fileno()
+    # and readFFEvents()) and sends the resulting strength to the wheel.
+    # Only writes to the serial port, so the axis loop never waits on it.
+
+    def __init__(self, source, ser):
+        super().__init__(daemon=True, name="ffb")
+        self.source = source
+        self.ser = ser
+        self.mixer = EffectMixer()
+        self.level = 0
+        self.timed = False
+        self.running = True
+
+    def step(self, timeout):
+        ready, _, _ = select.select([self.source], [], [], timeout)
+        now = time.monotonic()
+        if ready:
+            for event in self.source.readFFEvents():
+                self.mixer.handle(event, now)
+
+        level, remaining = self.mixer.output(now)
+        # One command covers at most FF_DURATION_MAX; wake up in time to send the next
+        clamped = remaining > FF_DURATION_MAX
+        remaining = min(remaining, FF_DURATION_MAX)
+        # The last command may have been timed to end here, and new events can
+        # change the duration, so resend even when the strength stays the same
+        if level != self.level or (level and (ready or self.timed)):
+            if level:
+                self.ser.write(encodeCommand(FF_PLAY, level, remaining))
+            else:
+                self.ser.write(encodeCommand(FF_STOP))
+            self.level = level
+            self.timed = bool(level and remaining)
+
+        # Wake up when an effect starts or ends
+        if clamped:
+            return (remaining - FF_RESEND_EARLY) / 1000.0
+        return remaining / 1000.0 if remaining else 1.0
+
+    def run(self):
+        timeout = 1.0
+        while self.running:
+            try:
+                timeout = self.step(timeout)
+            except (OSError, ValueError) as e:
+                print("FFB ERROR:", e)
+                timeout = 1.0
+                time.sleep(0.1)
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,150 @@
+import math
+
+# Adaptive noise filter for the wheel axis.
+#
+# The pot + ADS1115 noise differs from wheel to wheel, so nothing here is a
+# fixed number of raw units. The filter learns the noise while the wheel
+# stands still and derives everything else from it:
+#
+#   - stillness: a short-window level variance compared to the sample-to-
+#     sample difference variance. For pure noise var(x - mean) ≈ var(dx) / 2;
+#     any movement inflates the level variance far more than the differences,
+#     so the test works before the noise level is known
+#   - noise sigma: slow average of var(dx) / 2, only while still
+#   - filter strength: an EMA whose weight goes from ALPHA_REST when the
+#     input sits inside the noise to 1 (no smoothing, no lag) during fast moves
+#   - hysteresis: the output only moves once the filtered value left the
+#     band the residual noise can explain
+#   - deadzone: a few sigmas around center
+#
+# Every step is a handful of float operations, O(1) per sample.
+
+AXIS_MAX = 32767
+
+ALPHA_REST = 0.05          # EMA weight at rest (strong smoothing)
+MOTION_SIGMAS = 4.0        # Innovation (in sigmas) at which smoothing is off
+SPEED_ALPHA = 0.2          # Time constant of the innovation average
+LEVEL_ALPHA = 0.05         # Time constant of the stillness test
+STILL_RATIO = 2.0          # Level variance / noise variance below this = still
+NOISE_ALPHA = 0.002        # How fast the learned noise follows (while still)
+INITIAL_NOISE = 8.0        # Sigma guess in raw units until something is learned
+MIN_NOISE = 0.5            # A perfectly quiet ADC still has quantisation
+OUTLIER_VAR = 9.0          # Noise samples are capped at 3 sigmas (squared)
+HYSTERESIS_SIGMAS = 3.0    # In residual (filtered) noise sigmas
+DEADZONE_SIGMAS = 3.0      # In raw noise sigmas, around center
+
+
+class NoiseFilter:
+
+    def __init__(self, noise=None, deadzone=None, hysteresis=None, alphaRest=ALPHA_REST,
+                 motionSigmas=MOTION_SIGMAS):
+        # `noise`, `deadzone` and `hysteresis` fix that value instead of learning it
+        self.fixedNoise = noise
+        self.fixedDeadzone = deadzone
+        self.fixedHysteresis = hysteresis
+        self.alphaRest = alphaRest
+        self.motionSigmas = motionSigmas
+        # Residual noise of an EMA with weight a is sigma * sqrt(a / (2 - a))
+        self.restGain = math.sqrt(alphaRest / (2.0 - alphaRest))
+        self.reset()
+
+    def reset(self):
+        self.noiseVar = (self.fixedNoise or INITIAL_NOISE) ** 2
+        self.sigma = math.sqrt(self.noiseVar)
+        self.learned = 0
+        self.prev = None
+        self.mean = 0.0
+        self.levelVar = 0.0
+        self.diffVar = 0.0
+        self.speed = 0.0
+        self.filtered = 0.0
+        self.held = 0.0
+        self.output = 0
+        self.still = False
+        self.alpha = 1.0
+        self.updateLimits()
+
+    def updateLimits(self):
+        sigma = self.sigma
+        self.hysteresis = self.fixedHysteresis if self.fixedHysteresis is not None \
+            else HYSTERESIS_SIGMAS * sigma * self.restGain
+        self.deadzone = self.fixedDeadzone if self.fixedDeadzone is not None \
+            else DEADZONE_SIGMAS * sigma
+        self.deadzoneScale = AXIS_MAX / (AXIS_MAX - self.deadzone) if self.deadzone < AXIS_MAX else 0.0
+        self.motionLevel = self.motionSigmas * sigma
+
+    def update(self, x):
+        # One raw sample in (offset already applied), axis value out
+        prev = self.prev
+        if prev is None:
+            self.prev = self.mean = self.filtered = self.held = float(x)
+            self.output = self.shape(self.held)
+            return self.output
+        self.prev = x
+
+        # Stillness: level variance vs. difference variance
+        d = x - prev
+        self.diffVar += LEVEL_ALPHA * (d * d - self.diffVar)
+        e = x - self.mean
+        self.mean += LEVEL_ALPHA * e
+        self.levelVar += LEVEL_ALPHA * (e * e - self.levelVar)
+        self.still = self.levelVar * 2.0 < STILL_RATIO * max(self.diffVar, MIN_NOISE * MIN_NOISE)
+
+        if self.still and self.fixedNoise is None:
+            # The stillness test lags a sudden jump by a few samples, so single
+            # outliers are capped instead of dragging the estimate up
+            sample = d * d * 0.5
+            if sample > OUTLIER_VAR * self.noiseVar:
+                sample = OUTLIER_VAR * self.noiseVar
+            self.noiseVar += NOISE_ALPHA * (max(sample, MIN_NOISE * MIN_NOISE) - self.noiseVar)
+            self.learned += 1
+            # sqrt only every few samples; the estimate moves slowly anyway
+            if not self.learned & 31:
+                self.sigma = math.sqrt(self.noiseVar)
+                self.updateLimits()
+
+        # Filter strength from how far the input is from the filtered value
+        innovation = x - self.filtered
+        self.speed += SPEED_ALPHA * (abs(innovation) - self.speed)
+        ratio = self.speed / self.motionLevel
+        alpha = self.alphaRest + (1.0 - self.alphaRest) * (ratio * ratio if ratio < 1.0 else 1.0)
+        self.alpha = alpha
+        self.filtered += alpha * innovation
+
+        # Hysteresis: keep the output until the filtered value really moved
+        if abs(self.filtered - self.held) > self.hysteresis or alpha > 0.5:
+            self.held = self.filtered
+            self.output = self.shape(self.held)
+        return self.output
+
+    def updateMany(self, samples, count, offset=0):
+        # Feeds samples[:count] (e.g. FrameReader.samples), returns the last output
+        update = self.update
+        for i in range(count):
+            update(samples[i] + offset)
+        return self.output
+
+    def shape(self, value):
+        # Deadzone around center, rescaled so full lock still reaches ±AXIS_MAX
+        deadzone = self.deadzone
+        if value > deadzone:
+            value = (value - deadzone) * self.deadzoneScale
+        elif value < -deadzone:
+            value = (value + deadzone) * self.deadzoneScale
+        else:
+            return 0
+        if value > AXIS_MAX:
+            return AXIS_MAX
+        if value < -AXIS_MAX:
+            return -AXIS_MAX
+        return int(value)
+
+    def status(self):
+        return {
+            "noise": round(self.sigma, 2),
+            "deadzone": round(self.deadzone, 1),
+            "hysteresis": round(self.hysteresis, 2),
+            "alpha": round(self.alpha, 3),
+            "still": self.still,
+            "learned": self.learned,
+        }
@@ -0,0 +1,226 @@
+import time
+
+from wheelserial import FrameReader
+
+# -------- LINK DEFAULTS --------
+DEFAULT_BAUD = 115200                              # SERIAL_BAUD in the firmware
+BAUD_RATES = (2000000, 1000000, 500000, 250000)    # Tried fastest first
+BAUD_REPLY_TIMEOUT = 0.3                           # Must stay below BAUD_CONFIRM_MS in the firmware
+BAUD_REVERT_WAIT = 0.6                             # Firmware falls back after BAUD_CONFIRM_MS (500 ms)
+RESYNC_BREAK = b"\r\n" * 3                         # Ends a partial line or FF packet on the firmware
+
+ERROR_WINDOW = 2000                                # Lines per error-rate window
+ERROR_THRESHOLD = 0.01                             # Fall back above 1% bad lines
+
+PROBE_COUNT = 5000
+PROBE_CHECK = 0xA5A5
+
+# Non-numeric lines the firmware sends on purpose
+KNOWN_MESSAGES = (b"PAIRING_", b"BAUD_", b"PROBE_", b"ERROR:", b"BOOT_OK", b"STATS:")
+
+
+def sendCommand(ser, command):
+    ser.write(command.encode("ascii") + b"\r\n")
+
+def waitForLine(ser, prefix, timeout):
+    # Reads lines until one starts with `prefix` (or one of a tuple of them);
+    # samples and other lines are skipped
+    oldTimeout = ser.timeout
+    ser.timeout = 0.05
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            line = ser.readline().decode("utf-8", errors="ignore").strip()
+            if line.startswith(prefix):
+                return line
+    finally:
+        ser.timeout = oldTimeout
+    return None
+
+def checkBaud(ser, rate, timeout=BAUD_REPLY_TIMEOUT):
+    # BAUD_CHECK → BAUD_CONFIRMED at `rate`; answered in any state and changes
+    # nothing but a pending switch, so it tells which rate the firmware is on
+    ser.baudrate = rate
+    time.sleep(0.02)
+    ser.reset_input_buffer()
+    # Line breaks first: they end whatever the firmware collected at the wrong
+    # rate, including a started binary FF packet (6 bytes)
+    ser.write(RESYNC_BREAK)
+    sendCommand(ser, "BAUD_CHECK")
+    return waitForLine(ser, "BAUD_CONFIRMED", timeout) is not None
+
+def resyncBaud(ser, rates, timeout=BAUD_REPLY_TIMEOUT):
+    # First rate the firmware answers on; DEFAULT_BAUD (its reset state) if none
+    for rate in rates:
+        if checkBaud(ser, rate, timeout):
+            return rate
+    ser.baudrate = DEFAULT_BAUD
+    return None
+
+def switchBaud(ser, rate, timeout=BAUD_REPLY_TIMEOUT):
+    # BAUD:<rate> → BAUD_OK:<rate> (old rate), both switch,
+    # BAUD_CHECK → BAUD_CONFIRMED (new rate).
+    # Without the confirmation the firmware reverts to DEFAULT_BAUD by itself.
+    # A lost or garbled reply leaves the firmware state unknown, so the host
+    # only gives up after finding the rate the firmware is listening on.
+    oldRate = ser.baudrate
+    ser.reset_input_buffer()
+    sendCommand(ser, f"BAUD:{rate}")
+    if not waitForLine(ser, f"BAUD_OK:{rate}", timeout):
+        # Still on the old rate: the command never got through
+        if checkBaud(ser, oldRate, timeout):
+            return False
+        # It switched: after BAUD_CONFIRM_MS it is back on DEFAULT_BAUD
+        time.sleep(BAUD_REVERT_WAIT)
+        resyncBaud(ser, dict.fromkeys((DEFAULT_BAUD, oldRate, rate)), timeout)
+        return False
+
+    ser.flush()
+    if checkBaud(ser, rate, timeout):
+        return True
+
+    # The confirmation may have been lost in either direction: the firmware
+    # either reverts or already confirmed and stays on the new rate
+    time.sleep(BAUD_REVERT_WAIT)
+    return resyncBaud(ser, (DEFAULT_BAUD, rate), timeout) == rate
+
+def negotiateBaud(ser, rates=BAUD_RATES):
+    # Tries each rate above the current one, fastest first.
+    # Returns the rate the link ended up on.
+    for rate in sorted(rates, reverse=True):
+        if rate <= ser.baudrate:
+            continue
+        print(f"Trying {rate} baud...")
+        if switchBaud(ser, rate):
+            print(f"Link running at {rate} baud")
+            return rate
+    print(f"Link staying at {ser.baudrate} baud")
+    return ser.baudrate
+
+def fallbackBaud(ser, rates=BAUD_RATES):
+    # Steps down to the next slower rate that still confirms
+    for rate in sorted(rates, reverse=True) + [DEFAULT_BAUD]:
+        if rate >= ser.baudrate:
+            continue
+        if switchBaud(ser, rate):
+            print(f"Link fell back to {rate} baud")
+            return rate
+    return ser.baudrate
+
+
+class LinkMonitor:
+    # Counts garbled lines per window. Corrupted bytes show up as unknown
+    # non-numeric lines or as values outside the int16 range.
+
+    def __init__(self, window=ERROR_WINDOW, threshold=ERROR_THRESHOLD):
+        self.window = window
+        self.threshold = threshold
+        self.lines = 0
+        self.errors = 0
+        self.lastRate = 0.0
+
+    def update(self, samples, count, messages):
+        errors = 0
+        for i in range(count):
+            if samples[i] < -32768 or samples[i] > 32767:
+                errors += 1
+        for message in messages:
+            if not message.startswith(KNOWN_MESSAGES):
+                errors += 1
+        self.lines += count + len(messages)
+        self.errors += errors
+
+        if self.lines < self.window:
+            return False
+        self.lastRate = self.errors / self.lines
+        self.lines = 0
+        self.errors = 0
+        return self.lastRate > self.threshold
+
+
+def probeLink(ser, count=PROBE_COUNT, timeout=10.0):
+    # Asks the firmware for `count` numbered probe lines ("P<seq>,<check>")
+    # and measures throughput and how many arrived intact.
+    ser.reset_input_buffer()
+    reader = FrameReader(ser)
+    sendCommand(ser, f"PROBE:{count}")
+
+    seen = set()
+    corrupt = 0
+    received = 0
+    start = None
+    end = None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reader.poll(0.1)
+        now = time.monotonic()
+        for line in reader.messages:
+            if line == b"PROBE_END":
+                end = now
+                break
+            if not line.startswith(b"P"):
+                continue
+            if start is None:
+                start = now
+            received += len(line) + 2
+            try:
+                seq, check = line[1:].split(b",")
+                seq = int(seq)
+                if int(check) != seq ^ PROBE_CHECK:
+                    raise ValueError
+                seen.add(seq)
+            except ValueError:
+                corrupt += 1
+        if end is not None:
+            break
+
+    if start is None:
+        return None
+    seconds = max((end or time.monotonic()) - start, 1e-6)
+    return {
+        "baud": ser.baudrate,
+        "requested": count,
+        "valid": len(seen),
+        "corrupt": corrupt,
+        "missing": count - len(seen),
+        "seconds": seconds,
+        "bytesPerSecond": received / seconds,
+        "linesPerSecond": (len(seen) + corrupt) / seconds,
+        "errorRate": (count - len(seen)) / count,
+    }
+
+def requestStats(ser, timeout=2.0):
+    # STATS → "STATS:loops=..,maxLoopUs=..,..." with the firmware's counters
+    # since the last request (the firmware resets them after replying)
+    sendCommand(ser, "STATS")
+    line = waitForLine(ser, "STATS:", timeout)
+    if not line:
+        return None
+    stats = {}
+    for field in line[len("STATS:"):].split(","):
+        key, _, value = field.partition("=")
+        try:
+            stats[key] = int(value)
+        except ValueError:
+            pass
+    return stats
+
+def printStats(stats):
+    if not stats:
+        print("Stats: no reply (firmware without STATS support?)")
+        return
+    print(f"Firmware: {stats.get('loops', 0)} loops, "
+          f"avg {stats.get('avgLoopUs', 0)} us, max {stats.get('maxLoopUs', 0)} us, "
+          f"{stats.get('sent', 0)} sent, {stats.get('coalesced', 0)} coalesced, "
+          f"{stats.get('adcErrors', 0)} ADC errors")
+
+def printProbe(result):
+    if not result:
+        print("Probe: no reply (firmware without PROBE support?)")
+        return
+    print(f"Probe @ {result['baud']} baud: "
+          f"{result['valid']}/{result['requested']} valid, "
+          f"{result['corrupt']} corrupt, {result['missing']} missing, "
+          f"{result['bytesPerSecond'] / 1000:.1f} kB/s, "
+          f"{result['linesPerSecond']:.0f} lines/s, "
+          f"error rate {result['errorRate'] * 100:.3f}%")
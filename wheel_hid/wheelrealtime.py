@@ -0,0 +1,173 @@
+import gc
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+
+# -------- REALTIME DEFAULTS --------
+RT_PRIORITY = 50          # SCHED_FIFO priority (1..99)
+RT_NICE = -10             # Used when SCHED_FIFO is not allowed
+GC_INTERVAL = 1.0         # Seconds between manual young-generation collections
+GC_MIDDLE_EVERY = 10      # Every Nth collection also covers generation 1
+GC_FULL_EVERY = 60        # and every Nth one is a full collection (~once a minute)
+PAGE_SIZE = 4096
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+def parseCpuList(text):
+    # "2,3" or "0-3" or "1,4-5" → {1, 4, 5}
+    cpus = set()
+    if not text:
+        return cpus
+    for part in str(text).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.update(range(int(lo), int(hi) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def setPriority(priority=RT_PRIORITY, nice=RT_NICE):
+    # Try SCHED_FIFO first, then fall back to a negative nice value.
+    # Returns a short description of what was applied, or None.
+    if hasattr(os, "sched_setscheduler") and priority:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(int(priority)))
+            return f"SCHED_FIFO priority {priority}"
+        except (PermissionError, OSError) as e:
+            print(f"Realtime: SCHED_FIFO not allowed ({e}), trying nice")
+
+    if hasattr(os, "setpriority") and nice:
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, int(nice))
+            return f"nice {nice}"
+        except (PermissionError, OSError) as e:
+            print(f"Realtime: nice {nice} not allowed ({e})")
+
+    return None
+
+
+def pinCurrentThread(cpus):
+    # On Linux pid 0 means the calling thread, so the --split acquisition
+    # process can pin itself to other cores than the driver process.
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return None
+    try:
+        available = os.sched_getaffinity(0)
+        wanted = set(cpus) & available
+        if not wanted:
+            print(f"Realtime: cpus {sorted(cpus)} not available, keeping {sorted(available)}")
+            return None
+        os.sched_setaffinity(0, wanted)
+        return sorted(wanted)
+    except OSError as e:
+        print(f"Realtime: could not pin to cpus {sorted(cpus)} ({e})")
+        return None
+
+
+def lockMemory():
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            errno = ctypes.get_errno()
+            print(f"Realtime: mlockall failed ({os.strerror(errno)})")
+            return False
+        return True
+    except (OSError, AttributeError) as e:
+        print(f"Realtime: mlockall unavailable ({e})")
+        return False
+
+
+def pretouch(buf):
+    # Write one byte per page so the pages are faulted in (and locked)
+    # before the hot loop instead of on the first sample.
+    view = memoryview(buf).cast("B")
+    for i in range(0, len(view), PAGE_SIZE):
+        view[i] = 0
+    return buf
+
+
+def enableRealtime(priority=RT_PRIORITY, nice=RT_NICE, cpus=None, lock=True):
+    # Applies every realtime step that is permitted and reports the rest.
+    # Never raises: without permissions the driver just runs as before.
+    applied = []
+
+    if not sys.platform.startswith("linux"):
+        print(f"Realtime mode is only supported on Linux (running on {sys.platform})")
+        return applied
+
+    prio = setPriority(priority, nice)
+    if prio:
+        applied.append(prio)
+
+    pinned = pinCurrentThread(cpus)
+    if pinned:
+        applied.append(f"cpus {pinned}")
+
+    if lock and lockMemory():
+        applied.append("mlockall")
+
+    if applied:
+        print("Realtime: " + ", ".join(applied))
+    else:
+        print("Realtime: no settings could be applied, running normally")
+    return applied
+
+
+class HotLoopGC:
+    # Disables automatic garbage collection for the hot loop and runs a
+    # cheap young-generation collection at a fixed interval instead, so
+    # collection pauses happen at predictable points. Cycles that survive a
+    # young collection are promoted, so the older generations are collected
+    # too, just less often; the objects frozen at start() are skipped.
+
+    def __init__(self, interval=GC_INTERVAL, middleEvery=GC_MIDDLE_EVERY, fullEvery=GC_FULL_EVERY):
+        self.interval = interval
+        self.middleEvery = middleEvery
+        self.fullEvery = fullEvery
+        self.nextCollect = 0.0
+        self.collections = 0
+        self.wasEnabled = gc.isenabled()
+
+    def start(self):
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+        gc.disable()
+        self.nextCollect = time.monotonic() + self.interval
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def tick(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        if now >= self.nextCollect:
+            self.collections += 1
+            if self.collections % self.fullEvery == 0:
+                gc.collect(2)
+            elif self.collections % self.middleEvery == 0:
+                gc.collect(1)
+            else:
+                gc.collect(0)
+            self.nextCollect = now + self.interval
+
+    def stop(self):
+        if hasattr(gc, "unfreeze"):
+            gc.unfreeze()
+        if self.wasEnabled:
+            gc.enable()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
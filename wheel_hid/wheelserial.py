@@ -0,0 +1,129 @@
+import os
+import select
+from array import array
+
+from wheelrealtime import pretouch
+
+# -------- READER DEFAULTS --------
+READ_SIZE = 4096          # Bytes per readinto() call
+MAX_SAMPLES = 1024        # Samples parsed per poll before the rest is kept for later
+
+NL = 10                   # b"\n"
+CR = 13                   # b"\r"
+MINUS = 45                # b"-"
+DIGIT_0 = 48
+DIGIT_9 = 57
+
+
+class FrameReader:
+    # Bulk serial reader for the "<int>\r\n" sample stream.
+    #
+    # Every poll() does one large read into a preallocated bytearray and
+    # scans all complete lines in place, so when the OS buffer holds more
+    # than one sample they are all handled by a single syscall. Numbers
+    # are parsed straight from the ASCII bytes (no decode/strip). Lines
+    # that are not numbers (PAIRING_CONFIRMED, ERROR:..., ...) are
+    # collected in `messages`.
+
+    def __init__(self, ser, size=READ_SIZE, maxSamples=MAX_SAMPLES):
+        self.ser = ser
+        self.buf = pretouch(bytearray(size))
+        self.view = memoryview(self.buf)
+        self.fill = 0
+        self.samples = array("i", bytes(4 * maxSamples))
+        self.maxSamples = maxSamples
+        self.count = 0
+        self.messages = []
+        self.reads = 0
+        # Set after a full buffer was dropped: the rest of that line is garbage too
+        self.skipLine = False
+        try:
+            self.fd = ser.fileno()
+        except (AttributeError, OSError, ValueError):
+            self.fd = None
+
+    def readChunk(self, timeout):
+        # Reads whatever is available (at least one byte, or nothing on
+        # timeout) into the free part of the buffer.
+        free = self.view[self.fill:]
+        if self.fd is not None:
+            # timeout=None: the caller already knows the port is readable
+            if timeout is not None:
+                ready, _, _ = select.select([self.fd], [], [], timeout)
+                if not ready:
+                    return 0
+            n = os.readv(self.fd, [free])
+            if n == 0:
+                raise OSError("Serial port closed")
+        else:
+            # Windows: pyserial only offers readinto() on top of read()
+            waiting = min(max(self.ser.in_waiting, 1), len(free))
+            n = self.ser.readinto(free[:waiting]) or 0
+        self.reads += 1
+        self.fill += n
+        return n
+
+    def scan(self):
+        buf = self.buf
+        end = self.fill
+        samples = self.samples
+        maxSamples = self.maxSamples
+        count = 0
+        start = 0
+
+        if self.skipLine:
+            nl = buf.find(NL, 0, end)
+            if nl < 0:
+                self.fill = 0
+                self.count = 0
+                return 0
+            start = nl + 1
+            self.skipLine = False
+
+        while count < maxSamples:
+            nl = buf.find(NL, start, end)
+            if nl < 0:
+                break
+            stop = nl
+            if stop > start and buf[stop - 1] == CR:
+                stop -= 1
+            if stop > start:
+                first = buf[start]
+                if first == MINUS or DIGIT_0 <= first <= DIGIT_9:
+                    try:
+                        samples[count] = int(buf[start:stop])
+                        count += 1
+                    except (ValueError, OverflowError):
+                        self.messages.append(bytes(buf[start:stop]))
+                else:
+                    self.messages.append(bytes(buf[start:stop]))
+            start = nl + 1
+
+        # Keep the partial line (or unscanned samples) at the front
+        rest = end - start
+        if rest and start:
+            self.view[:rest] = self.view[start:end]
+        elif rest == len(buf):
+            # A full buffer without a line end is garbage
+            rest = 0
+            self.skipLine = True
+        self.fill = rest
+        self.count = count
+        return count
+
+    def reset(self):
+        # Drops buffered bytes, e.g. after the baud rate changed
+        self.fill = 0
+        self.count = 0
+        self.skipLine = False
+        self.messages.clear()
+
+    def poll(self, timeout=1.0):
+        # Returns the number of samples now in samples[:count]
+        self.messages.clear()
+        if self.fill == 0 or self.buf.find(NL, 0, self.fill) < 0:
+            self.readChunk(timeout)
+        return self.scan()
+
+    def latest(self):
+        return self.samples[self.count - 1] if self.count else None
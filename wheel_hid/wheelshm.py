@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Latest wheel sample in a small memory-mapped file, for overlays and loggers.
+#
+#   from wheelshm import StateReader
+#   state = StateReader().read()      # WheelState(seq, timestamp, raw, value) or None
+#
+# The driver (--shm) is the only writer; with --daemon every wheel gets its
+# own file (see devicePath). Readers never lock and never make a syscall
+# per read: a seqlock counter is odd while the writer is busy and changes
+# with every update, so a reader just retries if it raced a write.
+#
+#   python3 wheelshm.py           prints the state 10 times per second
+
+import os
+import sys
+import mmap
+import time
+import struct
+import tempfile
+from collections import namedtuple
+
+# -------- LAYOUT --------
+# 0  magic "WHL1"   4  version u16   6  reserved
+# 8  seqlock u64    16 sample seq u64   24 timestamp ns u64 (CLOCK_MONOTONIC)
+# 32 raw i32        36 axis value i32 (-32767..32767 after offset/filter, on every platform)
+STATE_MAGIC = b"WHL1"
+STATE_VERSION = 1
+STATE_SIZE = 64
+HEADER = struct.Struct("<4sHxx")
+LOCK = struct.Struct("<Q")
+PAYLOAD = struct.Struct("<QQii")
+LOCK_OFFSET = 8
+PAYLOAD_OFFSET = 16
+
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+STATE_FILE = os.path.join(SHM_DIR, "wheeldriver.state")
+
+WheelState = namedtuple("WheelState", "seq timestamp raw value")
+
+
+def devicePath(path, code):
+    # One state file per wheel in daemon mode: wheeldriver.state → wheeldriver.<code>.state
+    code = "".join(c if c.isalnum() or c in "-_" else "_" for c in code)
+    root, ext = os.path.splitext(path)
+    return f"{root}.{code}{ext}"
+
+
+class StatePublisher:
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, STATE_SIZE)
+            self.map = mmap.mmap(fd, STATE_SIZE)
+        finally:
+            os.close(fd)
+        self.map[:STATE_SIZE] = bytes(STATE_SIZE)
+        HEADER.pack_into(self.map, 0, STATE_MAGIC, STATE_VERSION)
+        self.lock = 0
+        self.seq = 0
+
+    def publish(self, raw, value, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        self.seq += 1
+        self.lock += 1
+        LOCK.pack_into(self.map, LOCK_OFFSET, self.lock)
+        PAYLOAD.pack_into(self.map, PAYLOAD_OFFSET, self.seq, timestamp, raw, value)
+        self.lock += 1
+        LOCK.pack_into(self.map, LOCK_OFFSET, self.lock)
+
+    def close(self):
+        self.map.close()
+
+
+class StateReader:
+
+    def __init__(self, path=STATE_FILE):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), STATE_SIZE, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self.map, 0)
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a wheel state file (version {STATE_VERSION})")
+        self.retries = 0
+
+    def read(self, attempts=1000):
+        # Returns the latest WheelState, or None before the first sample
+        m = self.map
+        for _ in range(attempts):
+            before, = LOCK.unpack_from(m, LOCK_OFFSET)
+            if before & 1:
+                self.retries += 1
+                continue
+            payload = PAYLOAD.unpack_from(m, PAYLOAD_OFFSET)
+            after, = LOCK.unpack_from(m, LOCK_OFFSET)
+            if before == after:
+                return WheelState(*payload) if payload[0] else None
+            self.retries += 1
+        return None
+
+    def close(self):
+        self.map.close()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else STATE_FILE
+    try:
+        reader = StateReader(path)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    try:
+        while True:
+            state = reader.read()
+            if state:
+                age = (time.monotonic_ns() - state.timestamp) / 1e6
+                print(f"seq={state.seq} raw={state.raw} value={state.value} age={age:.1f}ms")
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
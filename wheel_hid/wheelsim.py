@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+
+# Headless stand-in for arduinowheelreader.ino on a pty.
+#   python3 wheelsim.py --rate 1000 --waveform sine --noise 20
+#   python3 wheeldriver.py --port /dev/pts/N
+#
+# Speaks the same protocol as the firmware (BOOT_OK, PAIRING_REQUEST:,
+# PAIRING_OK/PAIRING_CONFIRMED, RESET_PAIRING/PAIRING_RESET, BAUD:,
+# BAUD_CHECK, PROBE:, STATS, binary FF commands, ERROR:ADC_READ_FAILED)
+# and can produce rates and failures the real board can't.
+#
+# The output side mirrors the firmware loop: replies are always queued
+# (println), while samples, probe lines and the STATS reply only go into
+# the 63-byte TX buffer when they fit. A sample that can't be sent yet is
+# replaced by the next one (coalesced). The buffer drains at baud/10
+# bytes per second, like the UART. When the host's end of the pty is set
+# to a different baud rate than the board's, both directions turn to noise.
+
+import os
+import sys
+import tty
+import math
+import time
+import fcntl
+import random
+import select
+import argparse
+from array import array
+
+# -------- FIRMWARE CONSTANTS (arduinowheelreader.ino) --------
+PAIRING_CODE = "FSMINEWHEEL123"
+PAIR_INTERVAL = 1.0
+STREAM_RATE = 100
+BAUD_RATES = (115200, 250000, 500000, 1000000, 2000000)
+SERIAL_BAUD = 115200
+BAUD_CONFIRM = 0.5
+PROBE_CHECK = 0xA5A5
+FF_SYNC = 0xF5
+FF_PACKET_LEN = 6
+RX_BUFFER = 64              # rxBuf, longer lines are cut
+TX_BUFFER = 63              # SERIAL_TX_BUFFER_SIZE - 1 on the UNO
+UNTHROTTLED_TX_BUFFER = 65536
+UART_SLACK = 0.005
+PROBE_LINE_MAX = 16
+SAMPLE_LINE_MAX = 8
+STATS_LINE_MAX = 128        # statsBuf, including the terminating NUL
+ADC_ERROR_LINE = b"ERROR:ADC_READ_FAILED"
+TCGETS2 = 0x802C542A        # Linux: termios2 with the exact c_ispeed/c_ospeed
+
+WAVEFORMS = ("sine", "triangle", "square", "ramp", "constant", "walk")
+
+
+def openPty():
+    # Returns (master fd, slave fd, slave path) for a raw pty that can be opened as a serial port
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+class FirmwareSim:
+
+    def __init__(self, rate=STREAM_RATE, waveform="sine", period=4.0, amplitude=30000, center=0,
+                 noise=0.0, burstEvery=0.0, burstLength=0.05, disconnectEvery=0.0, disconnectFor=2.0,
+                 corruptRate=0.0, adcErrorRate=0.0, code=PAIRING_CODE, pairInterval=PAIR_INTERVAL,
+                 seed=None, startTime=None, uart=True):
+        self.rate = rate
+        self.waveform = waveform
+        self.period = period
+        self.amplitude = amplitude
+        self.center = center
+        self.noise = noise
+        self.burstEvery = burstEvery
+        self.burstLength = burstLength
+        self.disconnectEvery = disconnectEvery
+        self.disconnectFor = disconnectFor
+        self.corruptRate = corruptRate
+        self.adcErrorRate = adcErrorRate
+        self.code = code
+        self.pairInterval = pairInterval
+        self.random = random.Random(seed)
+        # Shared multiprocessing.Value receiving the stream start time, for latency checks
+        self.startTime = startTime
+
+        self.master, self.slave, self.path = openPty()
+        os.set_blocking(self.master, False)
+        self.termios = array("i", bytes(4 * 64))
+        self.rx = bytearray()
+        self.ffBuf = bytearray(FF_PACKET_LEN)
+        self.ffPos = 0
+        self.tx = bytearray()
+        # Without the UART model output is only limited by how fast the host reads
+        self.uart = uart
+        self.txLimit = TX_BUFFER if uart else UNTHROTTLED_TX_BUFFER
+        self.credit = 0.0
+        self.lastDrain = time.monotonic()
+        self.running = False
+
+        self.pendingLine = None
+        self.statsOut = bytearray()
+        self.resetStats()
+
+        self.paired = False
+        self.baud = SERIAL_BAUD
+        self.baudPendingAt = None
+        self.probeRemaining = 0
+        self.probeSeq = 0
+        self.ffLevel = 0
+        self.ffStopAt = None
+        self.walk = 0.0
+        self.boot(time.monotonic())
+
+    # ---- protocol ----
+
+    def boot(self, now):
+        self.paired = False
+        self.baud = SERIAL_BAUD
+        self.baudPendingAt = None
+        self.probeRemaining = 0
+        self.ffLevel = 0
+        self.ffPos = 0
+        self.rx.clear()
+        self.pendingLine = None
+        self.seq = 0
+        self.streamStart = now
+        self.lastPair = now
+        self.write(b"BOOT_OK")
+
+    def write(self, line):
+        # Serial.println(): waits for room on the board, so it is never dropped
+        self.tx += line + b"\r\n"
+
+    def room(self):
+        return self.txLimit - len(self.tx)
+
+    def resetStats(self):
+        self.statLoops = 0
+        self.statLoopMaxUs = 0
+        self.statLoopTotalUs = 0
+        self.statSent = 0
+        self.statCoalesced = 0
+        self.statAdcErrors = 0
+
+    def queueStats(self):
+        avgUs = self.statLoopTotalUs // self.statLoops if self.statLoops else 0
+        self.statsOut = bytearray(
+            b"STATS:loops=%d,maxLoopUs=%d,avgLoopUs=%d,sent=%d,coalesced=%d,adcErrors=%d\r\n" % (
+                self.statLoops, self.statLoopMaxUs, avgUs,
+                self.statSent, self.statCoalesced, self.statAdcErrors))
+        self.resetStats()
+
+    def startStream(self, now):
+        self.seq = 0
+        self.streamStart = now
+        if self.startTime is not None:
+            self.startTime.value = now
+
+    def handleLine(self, line, now):
+        if line == b"PAIRING_OK":
+            if not self.paired:
+                self.startStream(now)
+            self.paired = True
+            self.write(b"PAIRING_CONFIRMED")
+        elif line == b"RESET_PAIRING":
+            self.paired = False
+            self.write(b"PAIRING_RESET")
+            self.switchBaud(SERIAL_BAUD)
+            self.baudPendingAt = None
+            self.ffLevel = 0
+            self.pendingLine = None
+        elif line.startswith(b"BAUD:"):
+            try:
+                rate = int(line[5:])
+            except ValueError:
+                rate = 0
+            if rate in BAUD_RATES:
+                self.write(b"BAUD_OK:%d" % rate)
+                self.switchBaud(rate)
+                self.baudPendingAt = now if rate != SERIAL_BAUD else None
+            else:
+                self.write(b"BAUD_ERR:%d" % rate)
+        elif line == b"BAUD_CHECK":
+            self.baudPendingAt = None
+            self.write(b"BAUD_CONFIRMED")
+        elif line == b"STATS":
+            if not self.statsOut:
+                self.queueStats()
+        elif line.startswith(b"PROBE:"):
+            try:
+                self.probeRemaining = int(line[6:]) & 0xFFFF
+            except ValueError:
+                self.probeRemaining = 0
+            self.probeSeq = 0
+
+    def handleFF(self, packet, now):
+        check = packet[1] ^ packet[2] ^ packet[3] ^ packet[4]
+        if check != packet[5]:
+            return
+        if packet[1] == ord("P") and packet[2] > 0:
+            duration = (packet[3] << 8) | packet[4]
+            self.ffLevel = packet[2]
+            self.ffStopAt = now + duration / 1000.0 if duration else None
+        else:
+            self.ffLevel = 0
+
+    def switchBaud(self, rate):
+        # Serial.flush() + Serial.begin(rate): what is queued still goes out at the old rate
+        while self.tx:
+            try:
+                n = os.write(self.master, self.garble(self.tx))
+            except BlockingIOError:
+                select.select([], [self.master], [], 0.01)
+                continue
+            except OSError:
+                self.tx.clear()
+                break
+            del self.tx[:n]
+        self.baud = rate
+
+    def hostBaud(self):
+        # Rate the host set on its end of the pty (None where it can't be read)
+        if self.termios is None:
+            return None
+        try:
+            fcntl.ioctl(self.master, TCGETS2, self.termios)
+        except OSError:
+            self.termios = None
+            return None
+        return self.termios[9]
+
+    def garble(self, data):
+        # Host and board on different rates: every byte arrives as noise
+        if self.hostBaud() in (None, self.baud):
+            return data
+        return bytes(self.random.randrange(256) for _ in data)
+
+    def readInput(self, now):
+        try:
+            data = self.garble(os.read(self.master, 4096))
+        except (BlockingIOError, OSError):
+            return
+        # handleSerial(): byte by byte, a binary FF packet goes to ffBuf even
+        # in the middle of a text line, which goes on collecting around it
+        for c in data:
+            if self.ffPos or c == FF_SYNC:
+                self.ffBuf[self.ffPos] = c
+                self.ffPos += 1
+                if self.ffPos == FF_PACKET_LEN:
+                    self.handleFF(bytes(self.ffBuf), now)
+                    self.ffPos = 0
+            elif c in (10, 13):
+                line = bytes(self.rx)
+                self.rx.clear()
+                if line:
+                    self.handleLine(line, now)
+            elif len(self.rx) < RX_BUFFER - 1:
+                self.rx.append(c)
+
+    # ---- signal ----
+
+    def value(self, t):
+        phase = (t / self.period) % 1.0 if self.period else 0.0
+        if self.waveform == "sine":
+            wave = math.sin(2 * math.pi * phase)
+        elif self.waveform == "triangle":
+            wave = 4 * abs(phase - 0.5) - 1
+        elif self.waveform == "square":
+            wave = 1.0 if phase < 0.5 else -1.0
+        elif self.waveform == "walk":
+            self.walk = max(-1.0, min(1.0, self.walk + self.random.gauss(0, 0.01)))
+            wave = self.walk
+        elif self.waveform == "ramp":
+            # Sequence number as the value, so a reader can tell which sample it got
+            return (self.seq % 65535) - 32767
+        else:
+            wave = 0.0
+        v = self.center + self.amplitude * wave
+        if self.noise:
+            v += self.random.gauss(0, self.noise)
+        return max(-32768, min(32767, int(round(v))))
+
+    def corrupt(self, line):
+        if not line:
+            return line
+        data = bytearray(line)
+        i = self.random.randrange(len(data))
+        data[i] = self.random.randrange(256)
+        if data[i] in (10, 13):
+            data[i] = 0x7F
+        return bytes(data)
+
+    def sample(self, t):
+        # updateADC(): a finished conversion replaces an unsent sample
+        if self.adcErrorRate and self.random.random() < self.adcErrorRate:
+            self.seq += 1
+            self.statAdcErrors += 1
+            if not self.statsOut and self.room() >= len(ADC_ERROR_LINE) + 2:
+                self.tx += ADC_ERROR_LINE + b"\r\n"
+            return
+        line = b"%d" % self.value(t)
+        self.seq += 1
+        if self.corruptRate and self.random.random() < self.corruptRate:
+            line = self.corrupt(line)
+        if self.pendingLine is not None:
+            self.statCoalesced += 1
+        self.pendingLine = line
+
+    # ---- bounded TX ----
+
+    def sendStats(self):
+        if self.statsOut:
+            n = min(self.room(), len(self.statsOut))
+            self.tx += self.statsOut[:n]
+            del self.statsOut[:n]
+
+    def sendSample(self):
+        if self.pendingLine is None or self.statsOut or self.room() < SAMPLE_LINE_MAX:
+            return
+        self.tx += self.pendingLine + b"\r\n"
+        self.pendingLine = None
+        self.statSent += 1
+
+    def sendProbe(self):
+        while self.probeRemaining and not self.statsOut and self.room() >= PROBE_LINE_MAX:
+            self.tx += b"P%d,%d\r\n" % (self.probeSeq, self.probeSeq ^ PROBE_CHECK)
+            self.probeSeq = (self.probeSeq + 1) & 0xFFFF
+            self.probeRemaining -= 1
+            if not self.probeRemaining:
+                self.write(b"PROBE_END")
+
+    def drain(self, now):
+        # Moves bytes from the TX buffer to the pty at the current baud rate
+        if self.uart:
+            # The sim loop wakes up every millisecond or so; an idle line banks
+            # at most UART_SLACK seconds so bursts can't exceed the baud rate
+            perSecond = self.baud / 10.0
+            self.credit = min(self.credit + (now - self.lastDrain) * perSecond, perSecond * UART_SLACK)
+            self.lastDrain = now
+            n = min(len(self.tx), int(self.credit))
+        else:
+            n = len(self.tx)
+        if not n:
+            return 0
+        try:
+            n = os.write(self.master, self.garble(self.tx[:n]))
+        except (BlockingIOError, OSError):
+            return 0
+        del self.tx[:n]
+        self.credit -= n
+        return n
+
+    def pump(self, now):
+        # Fill whatever fits, drain, repeat while the UART takes bytes
+        while True:
+            self.sendStats()
+            if self.paired and self.baudPendingAt is None:
+                self.sendProbe()
+                self.sendSample()
+            if not self.drain(now):
+                break
+
+    # ---- loop ----
+
+    def step(self, now):
+        started = time.perf_counter()
+        self.readInput(now)
+
+        if self.baudPendingAt is not None and now - self.baudPendingAt > BAUD_CONFIRM:
+            self.switchBaud(SERIAL_BAUD)
+            self.baudPendingAt = None
+        if self.ffLevel and self.ffStopAt is not None and now >= self.ffStopAt:
+            self.ffLevel = 0
+
+        if not self.paired:
+            if now - self.lastPair > self.pairInterval and not self.statsOut:
+                self.write(b"PAIRING_REQUEST:" + self.code.encode())
+                self.lastPair = now
+        elif self.baudPendingAt is None and not self.probeRemaining:
+            elapsed = now - self.streamStart
+            held = self.burstEvery and (elapsed % self.burstEvery) < self.burstLength
+            due = int(elapsed * self.rate)
+            # During a burst nothing is sent; the backlog goes out at once afterwards
+            while not held and self.seq < due:
+                self.sample(self.streamStart + self.seq / self.rate)
+                if self.uart:
+                    self.pump(now)
+                else:
+                    self.sendSample()
+
+        self.pump(now)
+
+        took = int((time.perf_counter() - started) * 1e6)
+        self.statLoops += 1
+        self.statLoopTotalUs += took
+        self.statLoopMaxUs = max(self.statLoopMaxUs, took)
+
+    def disconnected(self, now):
+        if not self.disconnectEvery:
+            return False
+        phase = (now - self.created) % (self.disconnectEvery + self.disconnectFor)
+        return phase >= self.disconnectEvery
+
+    def run(self, seconds=None, stop=None):
+        self.running = True
+        self.created = time.monotonic()
+        end = self.created + seconds if seconds else None
+        wasDisconnected = False
+        tick = min(0.001, 1.0 / max(self.rate, 1))
+        while self.running:
+            if stop is not None and stop.is_set():
+                break
+            now = time.monotonic()
+            if end and now >= end:
+                break
+            if self.disconnected(now):
+                # Silent like an unplugged board; it boots again afterwards
+                wasDisconnected = True
+                self.rx.clear()
+                self.tx.clear()
+                self.statsOut.clear()
+                try:
+                    os.read(self.master, 4096)
+                except OSError:
+                    pass
+                time.sleep(0.01)
+                continue
+            if wasDisconnected:
+                wasDisconnected = False
+                self.boot(now)
+            self.step(now)
+            select.select([self.master], [], [], tick)
+
+    def close(self):
+        self.running = False
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def buildParser():
+    arguments = argparse.ArgumentParser(description="Simulated wheel firmware on a pty")
+    arguments.add_argument("--rate", type=float, default=STREAM_RATE, help="Samples per second once paired")
+    arguments.add_argument("--waveform", choices=WAVEFORMS, default="sine", help="Shape of the simulated wheel movement")
+    arguments.add_argument("--period", type=float, default=4.0, help="Waveform period in seconds")
+    arguments.add_argument("--amplitude", type=float, default=30000, help="Waveform amplitude in raw units")
+    arguments.add_argument("--center", type=float, default=0, help="Rest position in raw units")
+    arguments.add_argument("--noise", type=float, default=0.0, help="Gaussian noise (standard deviation, raw units)")
+    arguments.add_argument("--burst-every", type=float, default=0.0, help="Hold samples back and send them at once every N seconds")
+    arguments.add_argument("--burst-length", type=float, default=0.05, help="Seconds of samples per burst")
+    arguments.add_argument("--disconnect-every", type=float, default=0.0, help="Go silent and reboot every N seconds")
+    arguments.add_argument("--disconnect-for", type=float, default=2.0, help="Seconds of silence per disconnect")
+    arguments.add_argument("--corrupt", type=float, default=0.0, help="Fraction of lines with a corrupted byte")
+    arguments.add_argument("--adc-errors", type=float, default=0.0, help="Fraction of samples replaced by ERROR:ADC_READ_FAILED")
+    arguments.add_argument("--code", default=PAIRING_CODE, help="Pairing code to announce")
+    arguments.add_argument("--unthrottled", action="store_true", help="No UART model: output is only limited by the reader")
+    arguments.add_argument("--seed", type=int, help="Random seed for noise and corruption")
+    arguments.add_argument("--seconds", type=float, help="Stop after N seconds")
+    return arguments
+
+def fromArgs(args, **extra):
+    return FirmwareSim(rate=args.rate, waveform=args.waveform, period=args.period,
+                       amplitude=args.amplitude, center=args.center, noise=args.noise,
+                       burstEvery=args.burst_every, burstLength=args.burst_length,
+                       disconnectEvery=args.disconnect_every, disconnectFor=args.disconnect_for,
+                       corruptRate=args.corrupt, adcErrorRate=args.adc_errors,
+                       code=args.code, seed=args.seed, uart=not args.unthrottled, **extra)
+
+
+if __name__ == "__main__":
+    args = buildParser().parse_args()
+    sim = fromArgs(args)
+    print(f"Simulated wheel on {sim.path} ({args.rate:g} Hz, {args.waveform})")
+    sys.stdout.flush()
+    try:
+        sim.run(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.close()
@@ -0,0 +1,211 @@
+import gc
+import os
+import time
+import select
+import struct
+import multiprocessing as mp
+from array import array
+from multiprocessing import shared_memory
+
+from wheelserial import FrameReader, MAX_SAMPLES
+from wheellink import DEFAULT_BAUD, LinkMonitor, fallbackBaud
+from wheelrealtime import HotLoopGC, pinCurrentThread
+
+# Split mode (Linux): serial acquisition and parsing in a child process,
+# filtering and emission in the driver process.
+#
+# The two are connected by a single-producer/single-consumer ring of
+# fixed-size records in multiprocessing.shared_memory. The producer only
+# ever writes `head`, the consumer only `tail`, so no lock is needed; a
+# byte on a pipe wakes the consumer when a batch was published. Whatever
+# the driver process does with the GIL (debug prints, metrics threads),
+# the serial port keeps being drained and every sample keeps the time it
+# was read.
+
+# -------- LAYOUT --------
+# 0   magic "WRG1"  4 version u16  8 capacity u32  12 record size u32
+# 64  head u64      72 dropped u64        (producer cache line)
+# 128 tail u64                            (consumer cache line)
+# 192 records: seq u64, timestamp ns u64 (CLOCK_MONOTONIC), raw i32, pad
+RING_MAGIC = b"WRG1"
+RING_VERSION = 1
+RING_CAPACITY = 4096          # Records, power of two
+HEADER = struct.Struct("<4sHxxII")
+RECORD = struct.Struct("<QQi4x")
+HEAD_OFFSET = 64
+DROPPED_OFFSET = 72
+TAIL_OFFSET = 128
+RECORDS_OFFSET = 192
+# Indexes into the u64 view that starts at HEAD_OFFSET
+HEAD, DROPPED, TAIL = 0, 1, (TAIL_OFFSET - HEAD_OFFSET) // 8
+
+
+class SampleRing:
+    # Aligned 8-byte counters are written with a single store, and records
+    # are written before `head` moves past them (x86/arm64 keep that order
+    # for the plain stores CPython does here).
+
+    def __init__(self, name=None, capacity=RING_CAPACITY):
+        if name is None:
+            if capacity & (capacity - 1):
+                raise ValueError("Ring capacity must be a power of two")
+            self.shm = shared_memory.SharedMemory(create=True, size=RECORDS_OFFSET + capacity * RECORD.size)
+            HEADER.pack_into(self.shm.buf, 0, RING_MAGIC, RING_VERSION, capacity, RECORD.size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        magic, version, capacity, size = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION or size != RECORD.size:
+            self.shm.close()
+            raise ValueError(f"{self.shm.name} is not a sample ring (version {RING_VERSION})")
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.counters = self.buf[HEAD_OFFSET:TAIL_OFFSET + 8].cast("Q")
+        self.seq = 0
+
+    @property
+    def head(self):
+        return self.counters[HEAD]
+
+    @property
+    def tail(self):
+        return self.counters[TAIL]
+
+    @property
+    def dropped(self):
+        return self.counters[DROPPED]
+
+    def pushMany(self, samples, count, timestamp):
+        # Producer: stores samples[:count] read at `timestamp`. If the consumer
+        # fell behind, the oldest samples of the batch are dropped (and counted)
+        # since the newest one is what the wheel is doing now.
+        counters = self.counters
+        head = counters[HEAD]
+        free = self.capacity - (head - counters[TAIL])
+        first = 0
+        if count > free:
+            first = count - free
+            counters[DROPPED] += first
+        seq = self.seq + first
+        buf = self.buf
+        mask = self.mask
+        pack = RECORD.pack_into
+        for i in range(first, count):
+            pack(buf, RECORDS_OFFSET + (head & mask) * RECORD.size, seq, timestamp, samples[i])
+            head += 1
+            seq += 1
+        self.seq = seq
+        counters[HEAD] = head
+        return count - first
+
+    def popInto(self, raws, stamps, seqs, maxCount):
+        # Consumer: copies up to maxCount records into the arrays, oldest first
+        counters = self.counters
+        tail = counters[TAIL]
+        n = min(counters[HEAD] - tail, maxCount)
+        buf = self.buf
+        mask = self.mask
+        unpack = RECORD.unpack_from
+        for i in range(n):
+            seqs[i], stamps[i], raws[i] = unpack(buf, RECORDS_OFFSET + ((tail + i) & mask) * RECORD.size)
+        counters[TAIL] = tail + n
+        return n
+
+    def close(self):
+        self.counters.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def acquire(ser, ring, wakeRead, wakeFd, stop, cpus=None):
+    # Child process: serial → FrameReader → ring, plus the link error fallback
+    os.close(wakeRead)
+    # Inherits the driver's affinity unless it gets cores of its own
+    pinned = pinCurrentThread(cpus)
+    if pinned:
+        print(f"Acquisition pinned to cpus {pinned}")
+    reader = FrameReader(ser)
+    monitor = LinkMonitor()
+    # Forked from a --realtime driver with automatic GC off: collect here
+    # on the same schedule, nobody else will
+    hotgc = None if gc.isenabled() else HotLoopGC().start()
+    try:
+        while not stop.is_set():
+            count = reader.poll(0.5)
+            if count:
+                ring.pushMany(reader.samples, count, time.monotonic_ns())
+                try:
+                    os.write(wakeFd, b"\0")
+                except BlockingIOError:
+                    pass    # Consumer has wake-ups pending already
+            if ser.baudrate > DEFAULT_BAUD and monitor.update(reader.samples, count, reader.messages):
+                print(f"Link error rate {monitor.lastRate * 100:.2f}%, falling back")
+                fallbackBaud(ser)
+                reader.reset()
+            if hotgc:
+                hotgc.tick()
+    except OSError as e:
+        print(f"Acquisition stopped: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(wakeFd)
+
+
+class SplitReader:
+    # Drop-in for FrameReader in the driver loop: poll() returns the number
+    # of samples in samples[:count], stamps[] holds when each one was read
+    # and seqs[] its acquisition number (gaps = samples dropped in the ring).
+
+    def __init__(self, ser, capacity=RING_CAPACITY, maxSamples=MAX_SAMPLES, cpus=None):
+        self.ser = ser
+        self.ring = SampleRing(capacity=capacity)
+        self.samples = array("i", bytes(4 * maxSamples))
+        self.stamps = array("Q", bytes(8 * maxSamples))
+        self.seqs = array("Q", bytes(8 * maxSamples))
+        self.maxSamples = maxSamples
+        self.count = 0
+        self.messages = []
+        self.stop = mp.Event()
+        self.wakeRead, wakeWrite = os.pipe()
+        os.set_blocking(wakeWrite, False)
+        # fork: the child inherits the open port and the mapped ring as they are
+        self.process = mp.get_context("fork").Process(
+            target=acquire, args=(ser, self.ring, self.wakeRead, wakeWrite, self.stop, cpus), daemon=True, name="wheel-acquire")
+        self.process.start()
+        os.close(wakeWrite)
+
+    def poll(self, timeout=1.0):
+        ring = self.ring
+        if ring.head == ring.tail:
+            ready, _, _ = select.select([self.wakeRead], [], [], timeout)
+            if ready and not os.read(self.wakeRead, 4096) and ring.head == ring.tail:
+                raise OSError("Serial port closed")
+        elif select.select([self.wakeRead], [], [], 0)[0]:
+            os.read(self.wakeRead, 4096)
+        self.count = ring.popInto(self.samples, self.stamps, self.seqs, self.maxSamples)
+        return self.count
+
+    def latest(self):
+        return self.samples[self.count - 1] if self.count else None
+
+    def reset(self):
+        self.count = 0
+
+    @property
+    def dropped(self):
+        return self.ring.dropped
+
+    def close(self):
+        self.stop.set()
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        os.close(self.wakeRead)
+        self.ring.close()
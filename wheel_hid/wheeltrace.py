@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+# Binary sample traces (wheeldriver.py --trace FILE) and the offline
+# wheel-trace analysis:
+#
+#   python3 wheeltrace.py summary trace.bin
+#   python3 wheeltrace.py rate | noise | linearity | latency trace.bin
+#
+# Traces are fixed-size little-endian records behind a 32-byte header, so
+# they can be read with array/struct or mapped straight into NumPy. The
+# driver side only needs the standard library; the analysis needs NumPy
+# and works on a memory map, so hour-long traces don't have to fit in RAM.
+
+import os
+import sys
+import time
+import queue
+import struct
+import argparse
+import threading
+
+from wheelserial import MAX_SAMPLES
+from wheelaxis import valueToPercent, remakevalue
+from wheelfilter import STILL_RATIO, MIN_NOISE
+
+# -------- LAYOUT --------
+# Header: magic "WTR1", version u16, record size u16, start ns u64 (CLOCK_MONOTONIC),
+#         wall clock start ns u64, reserved u64
+# Record: timestamp ns u64   when the sample was read from the port
+#         latency ns u32     read → emitted to the virtual device
+#         seq u32            host sample counter (gaps = samples lost before the host)
+#         raw i32            value from the wheel
+#         filtered i32       after offset and filter (before deadzone/hysteresis)
+#         emitted i32        axis value for this sample
+#         batch u16          samples delivered by the same read
+#         flags u16          FLAG_EMITTED: this value was written to the device
+TRACE_MAGIC = b"WTR1"
+TRACE_VERSION = 1
+HEADER = struct.Struct("<4sHHQQ8x")
+RECORD = struct.Struct("<QIIiiiHH")
+FLAG_EMITTED = 1
+
+TRACE_DTYPE = [
+    ("timestamp", "<u8"),
+    ("latency", "<u4"),
+    ("seq", "<u4"),
+    ("raw", "<i4"),
+    ("filtered", "<i4"),
+    ("emitted", "<i4"),
+    ("batch", "<u2"),
+    ("flags", "<u2"),
+]
+
+FLUSH_RECORDS = 4096
+
+
+class TraceWriter:
+    # Usage per read:  value = trace.process(samples, count, offset, noiseFilter)
+    #                  emit(value)
+    #                  trace.commit(readNs, time.monotonic_ns())
+    #
+    # Full buffers are written by a separate thread, so a slow disk (SD
+    # card) never holds up the read → emit path; spare buffers are reused.
+
+    def __init__(self, path, maxSamples=MAX_SAMPLES):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, RECORD.size,
+                                    time.monotonic_ns(), time.time_ns()))
+        self.buf = bytearray(RECORD.size * FLUSH_RECORDS)
+        self.used = 0
+        self.full = queue.SimpleQueue()
+        self.spare = queue.SimpleQueue()
+        self.error = None
+        self.thread = threading.Thread(target=self.writeLoop, daemon=True, name="wheel-trace")
+        self.thread.start()
+        self.seq = 0
+        self.raw = [0] * maxSamples
+        self.filtered = [0] * maxSamples
+        self.emitted = [0] * maxSamples
+        self.count = 0
+
+    def process(self, samples, count, offset=0, noiseFilter=None):
+        # Runs offset/filter per sample and keeps every step; returns the value to emit
+        raw, filtered, emitted = self.raw, self.filtered, self.emitted
+        for i in range(count):
+            x = samples[i]
+            raw[i] = x
+            if noiseFilter:
+                emitted[i] = noiseFilter.update(x + offset)
+                filtered[i] = int(noiseFilter.filtered)
+            else:
+                value = min(max(x + offset, -32767), 32767)
+                filtered[i] = emitted[i] = value
+        self.count = count
+        return emitted[count - 1] if count else None
+
+    def commit(self, readNs, emitNs, stamps=None, seqs=None):
+        # stamps/seqs: per-sample read times and sequence numbers (split mode)
+        count = self.count
+        last = count - 1
+        pack = RECORD.pack_into
+        for i in range(count):
+            readAt = stamps[i] if stamps is not None else readNs
+            seq = seqs[i] if seqs is not None else self.seq + i
+            if self.used + RECORD.size > len(self.buf):
+                self.flush()
+            pack(self.buf, self.used, readAt, min(max(emitNs - readAt, 0), 0xFFFFFFFF),
+                 seq & 0xFFFFFFFF, self.raw[i], self.filtered[i], self.emitted[i],
+                 min(count, 0xFFFF), FLAG_EMITTED if i == last else 0)
+            self.used += RECORD.size
+        self.seq = (seqs[last] + 1) if seqs is not None and count else self.seq + count
+        self.count = 0
+
+    def flush(self):
+        # Hands the filled buffer to the writer thread and goes on in a spare one
+        if not self.used:
+            return
+        self.full.put((self.buf, self.used))
+        try:
+            self.buf = self.spare.get_nowait()
+        except queue.Empty:
+            self.buf = bytearray(RECORD.size * FLUSH_RECORDS)
+        self.used = 0
+
+    def writeLoop(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            buf, used = item
+            if self.error is None:
+                try:
+                    self.file.write(memoryview(buf)[:used])
+                except OSError as e:
+                    # Losing the trace must not stop the driver; reported on close
+                    self.error = e
+            self.spare.put(buf)
+
+    def close(self):
+        self.flush()
+        self.full.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            print(f"Trace incomplete: {self.error}")
+
+
+# -------- ANALYSIS (NumPy) --------
+
+def loadTrace(path):
+    # Memory-mapped structured array (nothing is read until it is used) plus header
+    import numpy as np
+    with open(path, "rb") as f:
+        magic, version, size, startNs, wallNs = HEADER.unpack(f.read(HEADER.size))
+    if magic != TRACE_MAGIC or version != TRACE_VERSION or size != RECORD.size:
+        raise ValueError(f"{path} is not a wheel trace (version {TRACE_VERSION})")
+    count = (os.path.getsize(path) - HEADER.size) // RECORD.size
+    if count <= 0:
+        raise ValueError(f"{path} has no samples")
+    records = np.memmap(path, dtype=np.dtype(TRACE_DTYPE), mode="r", offset=HEADER.size, shape=(count,))
+    return records, {"start": startNs, "wall": wallNs}
+
+def mappingTables():
+    # valueToPercent / remakevalue (wheelaxis) over the whole axis range,
+    # so every analysis shows values exactly as the driver would
+    import numpy as np
+    axis = range(-32767, 32768)
+    percent = np.fromiter((valueToPercent(v) for v in axis), dtype=np.float64, count=65535)
+    vjoy = np.fromiter((remakevalue(v) for v in axis), dtype=np.int32, count=65535)
+    return percent, vjoy
+
+def toPercent(values, tables):
+    import numpy as np
+    return tables[0][np.clip(values, -32767, 32767) + 32767]
+
+def sampleRate(records):
+    t = records["timestamp"]
+    span = (int(t[-1]) - int(t[0])) / 1e9
+    return (len(t) - 1) / span if span > 0 else 0.0
+
+def analyzeRate(records, tables, args):
+    import numpy as np
+    t = records["timestamp"].astype(np.int64)
+    rate = sampleRate(records)
+    seconds = (t - t[0]) // 1_000_000_000
+    perSecond = np.bincount(seconds)
+    if len(perSecond) > 2:
+        perSecond = perSecond[1:-1]      # first and last second are partial
+    reads = np.flatnonzero(np.diff(t)) + 1
+    gaps = np.diff(t[reads]) / 1e6 if len(reads) > 1 else np.zeros(1)
+    seq = records["seq"].astype(np.int64)
+    missing = np.diff(seq) - 1
+    batch = records["batch"][np.concatenate(([0], reads))]
+    print(f"Samples      {len(records)} over {(t[-1] - t[0]) / 1e9:.1f}s, mean rate {rate:.1f} Hz")
+    print(f"Per second   min {perSecond.min()}  median {int(np.median(perSecond))}  "
+          f"max {perSecond.max()}  std {perSecond.std():.1f}")
+    print(f"Read gaps    p50 {np.percentile(gaps, 50):.2f}ms  p99 {np.percentile(gaps, 99):.2f}ms  "
+          f"max {gaps.max():.2f}ms")
+    print(f"Batch size   mean {batch.mean():.2f}  p99 {np.percentile(batch, 99):.0f}  max {batch.max()}")
+    print(f"Lost         {int(missing[missing > 0].sum())} samples in {int((missing > 0).sum())} gaps")
+    slow = np.flatnonzero(perSecond < np.median(perSecond) * 0.9)
+    if len(slow):
+        print(f"Slow seconds {', '.join(str(s + 1) for s in slow[:10])}{' ...' if len(slow) > 10 else ''}")
+
+def stillWindows(raw, size):
+    # Start indexes of non-overlapping windows where the wheel stood still,
+    # with the test wheelfilter.py uses: for pure noise var(x) ≈ var(dx) / 2,
+    # any movement inflates the level variance far more than the differences
+    import numpy as np
+    n = len(raw) // size
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    windows = raw[:n * size].reshape(n, size)
+    levelVar = windows.var(axis=1)
+    diffVar = np.diff(windows, axis=1).var(axis=1)
+    return np.flatnonzero(levelVar * 2.0 < STILL_RATIO * np.maximum(diffVar, MIN_NOISE * MIN_NOISE)) * size
+
+def analyzeNoise(records, tables, args):
+    # Welch-style spectrum over the windows where the wheel stood still
+    import numpy as np
+    rate = sampleRate(records)
+    size = args.window
+    raw = records["raw"].astype(np.float64)
+    filtered = records["filtered"].astype(np.float64)
+    if len(raw) < size:
+        print(f"Need at least {size} samples")
+        return
+    starts = stillWindows(raw, size)
+    if not len(starts):
+        print("No still segments found")
+        return
+    idx = starts[:, None] + np.arange(size)
+    taper = np.hanning(size)
+    freqs = np.fft.rfftfreq(size, 1.0 / rate)
+
+    def spectrum(values):
+        segs = values[idx]
+        segs = segs - segs.mean(axis=1, keepdims=True)
+        power = np.abs(np.fft.rfft(segs * taper, axis=1)) ** 2
+        # One-sided, so the bands of a table add up to the noise variance
+        power[:, 1:] *= 2.0
+        return power.mean(axis=0) / ((taper ** 2).sum() * size)
+
+    rawPower = spectrum(raw)
+    filteredPower = spectrum(filtered)
+    rawSigma = raw[idx].std(axis=1).mean()
+    filteredSigma = filtered[idx].std(axis=1).mean()
+    print(f"Still windows {len(starts)} x {size} samples at {rate:.0f} Hz")
+    print(f"Noise sigma   raw {rawSigma:.2f} ({toPercent(np.array([int(rawSigma)]), tables)[0]:.3f}% of half range), "
+          f"filtered {filteredSigma:.2f}")
+    print(f"{'band Hz':>16} {'raw rms':>9} {'filtered rms':>13}")
+    edges = np.linspace(0, freqs[-1], args.bands + 1)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        band = (freqs >= lo) & (freqs < hi) & (freqs > 0)
+        print(f"{lo:7.1f}-{hi:7.1f} {np.sqrt(rawPower[band].sum()):9.2f} "
+              f"{np.sqrt(filteredPower[band].sum()):13.2f}")
+    peaks = np.flatnonzero((rawPower[1:-1] > rawPower[:-2]) & (rawPower[1:-1] >= rawPower[2:])) + 1
+    top = peaks[np.argsort(rawPower[peaks])[::-1][:5]]
+    print("Strongest     " + ", ".join(f"{freqs[i]:.1f} Hz ({np.sqrt(rawPower[i]):.2f})" for i in sorted(top)))
+
+def analyzeLinearity(records, tables, args):
+    # Assumes the trace contains a few slow, even sweeps from lock to lock:
+    # then every part of the range should collect about the same number of
+    # samples. Empty bins inside the swept range are dead spots, big jumps
+    # between consecutive samples are where the wiper lost contact, and the
+    # cumulative distribution against a straight line gives the nonlinearity.
+    # Time spent standing still says nothing about the pot and is left out.
+    import numpy as np
+    raw = records["raw"].astype(np.int64)
+    size = 64
+    moving = np.ones(len(raw) // size, dtype=bool)
+    moving[stillWindows(raw, size) // size] = False
+    raw = raw[:len(moving) * size].reshape(-1, size)[moving].ravel()
+    if not len(raw):
+        print("No movement in the trace; sweep the wheel lock to lock")
+        return
+    lo, hi = np.percentile(raw, [0.5, 99.5])
+    if hi - lo < 1000:
+        print("Trace covers too little of the range; sweep the wheel lock to lock")
+        return
+    bins = args.bins
+    counts, edges = np.histogram(raw, bins=bins, range=(lo, hi))
+    expected = counts.mean()
+    dead = np.flatnonzero(counts < expected * args.dead)
+    percent = toPercent(edges.astype(np.int64), tables)
+    print(f"Swept range   {int(lo)} .. {int(hi)} ({percent[0]:.1f}% .. {percent[-1]:.1f}%), {bins} bins")
+    if len(dead):
+        print("Dead spots    " + ", ".join(f"{percent[i]:.1f}%..{percent[i + 1]:.1f}%" for i in dead[:12])
+              + (" ..." if len(dead) > 12 else ""))
+    else:
+        print("Dead spots    none")
+
+    step = np.abs(np.diff(raw))
+    typical = np.median(step[step > 0]) if (step > 0).any() else 1
+    jumps = np.flatnonzero(step > max(typical * args.jump, 200))
+    if len(jumps):
+        where = toPercent(raw[jumps], tables)
+        print(f"Jumps         {len(jumps)} larger than {max(typical * args.jump, 200):.0f} raw, "
+              f"at " + ", ".join(f"{p:.1f}%" for p in np.unique(np.round(where))[:12]))
+
+    cdf = np.cumsum(counts) / counts.sum()
+    line = np.arange(1, bins + 1) / bins
+    deviation = (cdf - line) * 100.0
+    worst = np.argmax(np.abs(deviation))
+    print(f"Nonlinearity  max {abs(deviation[worst]):.2f}% of travel at {percent[worst + 1]:.1f}%, "
+          f"density min/max {counts.min() / expected:.2f}/{counts.max() / expected:.2f}")
+    vjoy = tables[1][np.clip(edges.astype(np.int64), -32767, 32767) + 32767]
+    print(f"vJoy range    {vjoy[0]} .. {vjoy[-1]}")
+
+def analyzeLatency(records, tables, args):
+    # Host side only: time a sample waited in the OS buffer behind the
+    # others of its read (estimated from its position and the sample rate)
+    # plus read → emit in the driver
+    import numpy as np
+    t = records["timestamp"].astype(np.int64)
+    rate = sampleRate(records)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(t)) + 1))
+    sizes = np.diff(np.concatenate((starts, [len(t)])))
+    position = np.arange(len(t)) - np.repeat(starts, sizes)
+    queued = (np.repeat(sizes, sizes) - 1 - position) / rate * 1e6 if rate else np.zeros(len(t))
+    processing = records["latency"] / 1e3
+    emitted = (records["flags"] & FLAG_EMITTED) != 0
+    print(f"{'us':<26} {'p50':>9} {'p99':>9} {'p99.9':>9} {'max':>9}")
+    for label, values in (("queued before read (est.)", queued),
+                          ("read -> emit", processing),
+                          ("total", queued + processing),
+                          ("emitted samples", processing[emitted])):
+        if not len(values):
+            continue
+        p = np.percentile(values, [50, 99, 99.9])
+        print(f"{label:<26} {p[0]:9.1f} {p[1]:9.1f} {p[2]:9.1f} {values.max():9.1f}")
+    print(f"Emitted       {emitted.sum()} of {len(t)} samples ({emitted.mean() * 100:.1f}%), "
+          f"the rest were superseded within their read")
+
+def analyzeSummary(records, tables, args):
+    for title, fn in (("Sample rate", analyzeRate), ("Noise", analyzeNoise),
+                      ("Linearity", analyzeLinearity), ("Latency", analyzeLatency)):
+        print(f"\n== {title} ==")
+        fn(records, tables, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="wheel-trace", description="Offline analysis of wheeldriver.py --trace files")
+    parser.add_argument("analysis", choices=("summary", "rate", "noise", "linearity", "latency"))
+    parser.add_argument("trace", help="Trace file written with --trace")
+    parser.add_argument("--window", type=int, default=1024, help="FFT window in samples")
+    parser.add_argument("--bands", type=int, default=8, help="Frequency bands in the noise table")
+    parser.add_argument("--bins", type=int, default=100, help="Bins across the swept range")
+    parser.add_argument("--dead", type=float, default=0.1, help="Bins below this share of the mean are dead spots")
+    parser.add_argument("--jump", type=float, default=20.0, help="Steps this many times the median are jumps")
+    args = parser.parse_args()
+
+    try:
+        records, header = loadTrace(args.trace)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    except ImportError:
+        print("ERROR: wheel-trace needs NumPy (pip3 install numpy)")
+        sys.exit(1)
+    tables = mappingTables()
+    {"summary": analyzeSummary, "rate": analyzeRate, "noise": analyzeNoise,
+     "linearity": analyzeLinearity, "latency": analyzeLatency}[args.analysis](records, tables, args)